@@ -0,0 +1,248 @@
+"""
+Database access for the AI Education Agent API
+Async SQLAlchemy engine on asyncpg with a pooled session factory, and the student/session
+stores the API handlers read and write through
+"""
+
+from sqlalchemy import String, JSON, select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from redis import asyncio as aioredis
+from typing import List, Optional, Dict, Any
+from collections import defaultdict
+import os
+import orjson
+
+def _async_url(url: str) -> str:
+    """Point plain postgresql:// URLs at the asyncpg driver"""
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# One pool per worker process; pre-ping drops connections PgBouncer/Postgres have closed.
+# Size it so workers x (pool + overflow) stays within what PgBouncer/Postgres accept
+engine = create_async_engine(
+    _async_url(DATABASE_URL),
+    pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_timeout=30,
+    pool_pre_ping=True,
+    # SQLAlchemy reuses compiled SQL for the store's fixed select()/insert() shapes, and the
+    # asyncpg adapter keeps each statement prepared per connection (PgBouncer tracks them
+    # through max_prepared_statements)
+    query_cache_size=500,
+    connect_args={"prepared_statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "256"))},
+    echo=False
+) if DATABASE_URL else None
+
+async_session = async_sessionmaker(engine, expire_on_commit=False) if engine else None
+
+class Base(DeclarativeBase):
+    pass
+
+class StudentRecord(Base):
+    """Student profile document, stored as the API returns it"""
+    __tablename__ = "student_profiles"
+
+    student_id: Mapped[str] = mapped_column(String, primary_key=True)
+    profile: Mapped[Dict[str, Any]] = mapped_column(JSON)
+
+class SessionRecord(Base):
+    """Learning session document, indexed by the student it belongs to"""
+    __tablename__ = "session_records"
+
+    session_id: Mapped[str] = mapped_column(String, primary_key=True)
+    student_id: Mapped[Optional[str]] = mapped_column(String, index=True)
+    session: Mapped[Dict[str, Any]] = mapped_column(JSON)
+
+async def init_models():
+    """Create the store tables if they don't exist yet"""
+    if engine is not None:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+async def close():
+    if engine is not None:
+        await engine.dispose()
+
+class MemoryStore:
+    """Per-process dict storage, used when DATABASE_URL is not configured"""
+
+    def __init__(self):
+        self.students: Dict[str, Dict] = {}
+        self.sessions: Dict[str, Dict] = {}
+        # Secondary index so a student's sessions don't need a scan of every session
+        self.sessions_by_student: Dict[str, List[str]] = defaultdict(list)
+
+    async def add_student(self, student: Dict):
+        self.students[student["student_id"]] = student
+
+    async def get_student(self, student_id: str) -> Optional[Dict]:
+        return self.students.get(student_id)
+
+    async def add_session(self, session: Dict):
+        if session["session_id"] not in self.sessions:
+            self.sessions_by_student[session["student_id"]].append(session["session_id"])
+        self.sessions[session["session_id"]] = session
+
+    async def sessions_for(self, student_id: str) -> List[Dict]:
+        return [self.sessions[sid] for sid in self.sessions_by_student.get(student_id, ())]
+
+    async def count_students(self) -> int:
+        return len(self.students)
+
+    async def count_sessions(self) -> int:
+        return len(self.sessions)
+
+class SQLStore:
+    """Postgres-backed storage shared by every worker process"""
+
+    async def add_student(self, student: Dict):
+        # One INSERT ... ON CONFLICT round trip instead of merge()'s SELECT then INSERT/UPDATE
+        stmt = pg_insert(StudentRecord).values(student_id=student["student_id"], profile=student)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StudentRecord.student_id],
+            set_={"profile": stmt.excluded.profile}
+        )
+        async with async_session() as s, s.begin():
+            await s.execute(stmt)
+
+    async def get_student(self, student_id: str) -> Optional[Dict]:
+        async with async_session() as s:
+            return await s.scalar(
+                select(StudentRecord.profile).where(StudentRecord.student_id == student_id)
+            )
+
+    async def add_session(self, session: Dict):
+        async with async_session() as s, s.begin():
+            s.add(SessionRecord(
+                session_id=session["session_id"],
+                student_id=session["student_id"],
+                session=session
+            ))
+
+    async def sessions_for(self, student_id: str) -> List[Dict]:
+        async with async_session() as s:
+            result = await s.scalars(
+                select(SessionRecord.session).where(SessionRecord.student_id == student_id)
+            )
+            return list(result)
+
+    async def count_students(self) -> int:
+        async with async_session() as s:
+            return await s.scalar(select(func.count()).select_from(StudentRecord))
+
+    async def count_sessions(self) -> int:
+        async with async_session() as s:
+            return await s.scalar(select(func.count()).select_from(SessionRecord))
+
+class RedisStore:
+    """Redis-backed storage shared by every worker process, for deployments without Postgres.
+
+    Documents are stored as JSON under student:{id} / session:{id}; each student's session
+    ids are kept in a list so sessions_for is one LRANGE plus one MGET. Nothing here sets
+    a TTL, but a Redis running with an allkeys-* eviction policy can still drop keys.
+    """
+
+    def __init__(self, url: str, prefix: str = "agentminds"):
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    async def add_student(self, student: Dict):
+        async with self.redis.pipeline() as pipe:
+            pipe.set(self._key("student", student["student_id"]), orjson.dumps(student))
+            pipe.sadd(self._key("students"), student["student_id"])
+            await pipe.execute()
+
+    async def get_student(self, student_id: str) -> Optional[Dict]:
+        data = await self.redis.get(self._key("student", student_id))
+        return orjson.loads(data) if data is not None else None
+
+    async def add_session(self, session: Dict):
+        session_id = session["session_id"]
+        await self.redis.set(self._key("session", session_id), orjson.dumps(session))
+        if await self.redis.sadd(self._key("sessions"), session_id):
+            await self.redis.rpush(self._key("student_sessions", str(session["student_id"])), session_id)
+
+    async def sessions_for(self, student_id: str) -> List[Dict]:
+        session_ids = await self.redis.lrange(self._key("student_sessions", student_id), 0, -1)
+        if not session_ids:
+            return []
+        docs = await self.redis.mget([self._key("session", sid.decode()) for sid in session_ids])
+        return [orjson.loads(doc) for doc in docs if doc is not None]
+
+    async def count_students(self) -> int:
+        return await self.redis.scard(self._key("students"))
+
+    async def count_sessions(self) -> int:
+        return await self.redis.scard(self._key("sessions"))
+
+class CachedStore:
+    """Read-through Redis cache in front of another store.
+
+    Reads try Redis first and fill it from the store on a miss. Writes go to the store and
+    then delete the keys they affect, so the next read reloads fresh data; the TTL bounds
+    how long a read racing a write can serve the old value. Misses are cached too (as JSON
+    null, for a shorter miss_ttl) so unknown ids don't reach the database on every request.
+    """
+
+    def __init__(self, store, url: str, prefix: str = "agentminds:cache", ttl: int = 300,
+                 miss_ttl: int = 60):
+        self.store = store
+        self.redis = aioredis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    async def _cached(self, key: str, load):
+        data = await self.redis.get(key)
+        if data is not None:
+            return orjson.loads(data)
+        value = await load()
+        await self.redis.set(key, orjson.dumps(value), ex=self.ttl if value is not None else self.miss_ttl)
+        return value
+
+    async def add_student(self, student: Dict):
+        await self.store.add_student(student)
+        await self.redis.delete(self._key("student", student["student_id"]))
+
+    async def get_student(self, student_id: str) -> Optional[Dict]:
+        return await self._cached(self._key("student", student_id),
+                                  lambda: self.store.get_student(student_id))
+
+    async def add_session(self, session: Dict):
+        await self.store.add_session(session)
+        await self.redis.delete(self._key("student_sessions", str(session["student_id"])))
+
+    async def sessions_for(self, student_id: str) -> List[Dict]:
+        return await self._cached(self._key("student_sessions", student_id),
+                                  lambda: self.store.sessions_for(student_id))
+
+    async def count_students(self) -> int:
+        return await self.store.count_students()
+
+    async def count_sessions(self) -> int:
+        return await self.store.count_sessions()
+
+def get_store():
+    """Postgres when DATABASE_URL is set, Redis when REDIS_URL is, otherwise in-process memory.
+
+    With both configured, Postgres stays the source of truth and Redis caches its reads.
+    Only the first two are shared, so run a single worker when neither is configured.
+    """
+    redis_url = os.getenv("REDIS_URL")
+    if async_session is not None:
+        return CachedStore(SQLStore(), redis_url) if redis_url else SQLStore()
+    if redis_url:
+        return RedisStore(redis_url)
+    return MemoryStore()
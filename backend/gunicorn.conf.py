@@ -0,0 +1,24 @@
+"""
+Gunicorn configuration for the AI Education Agent API
+Usage: gunicorn -c gunicorn.conf.py ai_main:app
+"""
+
+import os
+
+# Server socket
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Worker processes: the usual 2n+1, overridable per deployment
+workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Connection handling: hold idle keep-alive connections long enough for clients to reuse them
+backlog = 4096
+keepalive = 30
+timeout = 60
+graceful_timeout = 30
+
+# Logging: access lines are off unless GUNICORN_ACCESSLOG names a target (e.g. "-")
+accesslog = os.getenv("GUNICORN_ACCESSLOG")
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
@@ -5,40 +5,245 @@ Provides REST API endpoints for the personalized learning system
 
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Set, Tuple
 import uvicorn
 from datetime import datetime
 import os
+import sys
+import time
+import logging
+from contextlib import asynccontextmanager
+from anyio import to_thread, from_thread
+import asyncio
+import orjson
+from openai import AsyncOpenAI, OpenAIError
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.decorator import cache
+from redis import asyncio as aioredis
+from collections import OrderedDict
+import threading
+import numpy as np
 from dotenv import load_dotenv
+from middleware import PreflightMiddleware
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Sync (LLM / compute) handlers run on AnyIO's threadpool; size it for slow model calls
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "100"))
+
+class SemanticCache:
+    """Memo of AI answers keyed by question meaning rather than exact wording.
+
+    Questions are embedded with OpenAI's embeddings endpoint, the same scheme as the
+    ml-models SemanticCache, and matched by cosine similarity (inner product of unit
+    vectors) within a scope (the subject), so a physics answer is never served for a
+    chemistry question. The least recently hit entry is evicted once max_entries is
+    reached. Without an OpenAI client, or when the embeddings call fails, lookups miss.
+    """
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 10_000,
+                 embedding_model: str = "text-embedding-3-small"):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedding_model = embedding_model
+        self._entries: "OrderedDict[int, Tuple[str, np.ndarray, Dict[str, Any]]]" = OrderedDict()
+        self._next_id = 0
+        # Stacked vectors of the current entries, rebuilt after an add or eviction
+        self._ids: List[int] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._scope_array: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of the text, or None if there is no client or the call fails"""
+        if openai_client is None:
+            return None
+        try:
+            response = await openai_client.embeddings.create(model=self.embedding_model, input=text)
+        except OpenAIError:
+            return None
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def lookup(self, vector: Optional[np.ndarray], scope: str = "") -> Optional[Dict[str, Any]]:
+        """Cached value of the nearest question in the scope, if it is similar enough"""
+        with self._lock:
+            if vector is None or not self._entries:
+                return None
+            if self._matrix is None:
+                self._ids = list(self._entries)
+                self._matrix = np.vstack([self._entries[entry_id][1] for entry_id in self._ids])
+                self._scope_array = np.array([self._entries[entry_id][0] for entry_id in self._ids], dtype=object)
+            similarities = np.where(self._scope_array == scope, self._matrix @ vector, -np.inf)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                return None
+            entry_id = self._ids[best]
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][2]
+
+    def add(self, vector: Optional[np.ndarray], value: Dict[str, Any], scope: str = ""):
+        if vector is None:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[self._next_id] = (scope, vector, value)
+            self._next_id += 1
+            self._matrix = None
+
+doubt_cache = SemanticCache()
+
+class BatchingDispatcher:
+    """Coalesces prompts that arrive within a short window into one batched model call.
+
+    Each submit() waits on its own future; the collector gathers up to max_batch queued
+    prompts, hands them to complete_batch in a single call and splits the results back.
+    """
+
+    def __init__(self, complete_batch: Callable[[List[str]], Awaitable[List[str]]],
+                 max_batch: int = 16, window_seconds: float = 0.005):
+        self.complete_batch = complete_batch
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # The event loop only keeps weak references to tasks; holding them here keeps an
+        # in-flight batch from being garbage-collected before it resolves its futures
+        self._dispatches: Set[asyncio.Task] = set()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Let batches already sent finish, so their callers get an answer
+        await asyncio.gather(*self._dispatches, return_exceptions=True)
+
+    async def submit(self, prompt: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window_seconds
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[tuple]):
+        try:
+            results = await self.complete_batch([prompt for prompt, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) if os.getenv("OPENAI_API_KEY") else None
+
+async def complete_prompts(prompts: List[str]) -> List[str]:
+    """One completions call for a whole batch; the endpoint accepts an array of prompts"""
+    response = await openai_client.completions.create(
+        model="gpt-3.5-turbo-instruct",
+        prompt=prompts,
+        max_tokens=400,
+        temperature=0.7
+    )
+    texts = [""] * len(prompts)
+    for choice in response.choices:
+        texts[choice.index] = choice.text.strip()
+    return texts
+
+dispatcher = BatchingDispatcher(complete_prompts, max_batch=16, window_seconds=0.005)
+
+def generate_text(prompt: str) -> Optional[str]:
+    """Run a prompt through the dispatcher from a threadpool handler; None if no text came back"""
+    if openai_client is None:
+        return None
+    try:
+        return from_thread.run(dispatcher.submit, prompt) or None
+    except Exception:
+        logger.warning("Text generation failed", exc_info=True)
+        return None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    dispatcher.start()
+
+    # Read-heavy GET responses are cached in Redis (bounded by its allkeys-lru policy);
+    # without REDIS_URL, fall back to a per-process in-memory cache
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        FastAPICache.init(RedisBackend(aioredis.from_url(redis_url)), prefix="agentminds")
+    else:
+        FastAPICache.init(InMemoryBackend(), prefix="agentminds")
+    yield
+    await dispatcher.stop()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Education Agent",
     description="Personalized learning system for government schools",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend integration
+CORS_ORIGINS = ["http://localhost:3000", "http://localhost:3001"]  # React dev server
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],  # React dev server
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (analytics, worksheets) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
+# Added last so it wraps everything: preflights are answered before CORSMiddleware and routing
+app.add_middleware(PreflightMiddleware, allow_origins=CORS_ORIGINS)
+
 # Security
 security = HTTPBearer()
 
 # Pydantic models for API requests/responses
 class StudentProfile(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     student_id: str
     name: str
     grade: int
@@ -47,6 +252,8 @@ class StudentProfile(BaseModel):
     learning_style: Optional[str] = None
 
 class AcademicRecordInput(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     student_id: str
     subject: str
     topic: Optional[str] = None
@@ -57,12 +264,16 @@ class AcademicRecordInput(BaseModel):
     academic_year: str
 
 class LearningSessionRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     student_id: str
     subject: str
     topic: str
     session_type: str = "lesson"
 
 class DoubtQueryRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     student_id: str
     question: str
     context: Optional[str] = None
@@ -70,50 +281,76 @@ class DoubtQueryRequest(BaseModel):
     topic: Optional[str] = None
 
 class WorksheetRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     student_id: str
     subject: str
     topic: str
     difficulty_level: int = 1
     num_problems: int = 5
 
+# ISO timestamp shared by every response within the same second
+_ts_cache = ["", 0]
+
+def now_iso() -> str:
+    """Current UTC time as an ISO-8601 string, reformatted at most once per second"""
+    now = int(time.time())
+    if _ts_cache[1] != now:
+        _ts_cache[0] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+        _ts_cache[1] = now
+    return _ts_cache[0]
+
 # API Routes
+#
+# Handler convention: routes that will call an LLM or do heavy computation are
+# plain `def`, so FastAPI runs them on the threadpool and the event loop keeps
+# accepting connections. Routes that only wait on the database stay `async def`
+# and must use async drivers (asyncpg / SQLAlchemy async), never blocking calls.
 
-@app.get("/")
+# Probe payloads are constant apart from the trailing timestamp, which is spliced onto
+# bytes encoded once at import
+_ROOT_PREFIX = orjson.dumps({
+    "message": "AI Education Agent API",
+    "status": "active",
+    "version": "1.0.0"
+})[:-1] + b',"timestamp":"'
+
+_HEALTH_PREFIX = orjson.dumps({
+    "status": "healthy",
+    "database": "connected",  # TODO: Add actual DB health check
+    "ai_services": "available"  # TODO: Add AI service health check
+})[:-1] + b',"timestamp":"'
+
+def _stamped(prefix: bytes) -> Response:
+    return Response(prefix + now_iso().encode() + b'"}', media_type="application/json")
+
+@app.get("/", response_model=None)
 async def root():
     """Health check endpoint"""
-    return {
-        "message": "AI Education Agent API",
-        "status": "active",
-        "version": "1.0.0",
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    return _stamped(_ROOT_PREFIX)
 
-@app.get("/health")
+@app.get("/health", response_model=None)
 async def health_check():
     """Detailed health check"""
-    return {
-        "status": "healthy",
-        "database": "connected",  # TODO: Add actual DB health check
-        "ai_services": "available",  # TODO: Add AI service health check
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    return _stamped(_HEALTH_PREFIX)
 
 # Student Management Endpoints
 
 @app.post("/api/students", response_model=Dict[str, Any])
 async def create_student(student: StudentProfile):
     """Create a new student profile"""
-    # TODO: Implement database integration
+    # TODO: Implement database integration (async DB driver; keep this handler async)
     return {
         "message": "Student profile created successfully",
         "student_id": student.student_id,
         "status": "created"
     }
 
-@app.get("/api/students/{student_id}")
+@app.get("/api/students/{student_id}", response_model=None)
+@cache(expire=60)
 async def get_student(student_id: str):
     """Get student profile and learning analytics"""
-    # TODO: Implement database query
+    # TODO: Implement database query (async DB driver; keep this handler async)
     return {
         "student_id": student_id,
         "name": "Sample Student",
@@ -127,7 +364,7 @@ async def get_student(student_id: str):
 @app.post("/api/students/{student_id}/academic-records")
 async def add_academic_record(student_id: str, record: AcademicRecordInput):
     """Add academic performance record"""
-    # TODO: Implement database storage and analysis
+    # TODO: Implement database storage and analysis (async DB driver; keep this handler async)
     return {
         "message": "Academic record added successfully",
         "student_id": student_id,
@@ -137,9 +374,12 @@ async def add_academic_record(student_id: str, record: AcademicRecordInput):
 # Learning Session Endpoints
 
 @app.post("/api/learning-sessions")
-async def start_learning_session(session_request: LearningSessionRequest):
+def start_learning_session(session_request: LearningSessionRequest):
     """Start a personalized learning session"""
-    # TODO: Implement AI-powered content personalization
+    # TODO: Implement AI-powered content personalization (blocking LLM/compute work; keep this handler sync)
+    explanation = generate_text(
+        f"Explain {session_request.topic} in {session_request.subject} to a school student in simple steps."
+    ) or "Personalized explanation based on student's level..."
     return {
         "session_id": "session_123",
         "student_id": session_request.student_id,
@@ -150,7 +390,7 @@ async def start_learning_session(session_request: LearningSessionRequest):
                 {
                     "type": "explanation",
                     "title": f"Introduction to {session_request.topic}",
-                    "content": "Personalized explanation based on student's level..."
+                    "content": explanation
                 },
                 {
                     "type": "example",
@@ -161,10 +401,11 @@ async def start_learning_session(session_request: LearningSessionRequest):
         }
     }
 
-@app.get("/api/learning-sessions/{session_id}")
+@app.get("/api/learning-sessions/{session_id}", response_model=None)
+@cache(expire=30)
 async def get_learning_session(session_id: str):
     """Get learning session details and progress"""
-    # TODO: Implement session tracking
+    # TODO: Implement session tracking (async DB driver; keep this handler async)
     return {
         "session_id": session_id,
         "progress": 65.0,
@@ -176,9 +417,13 @@ async def get_learning_session(session_id: str):
 # Worksheet Generation Endpoints
 
 @app.post("/api/worksheets/generate")
-async def generate_worksheet(worksheet_request: WorksheetRequest):
+def generate_worksheet(worksheet_request: WorksheetRequest):
     """Generate personalized worksheet based on student's level"""
-    # TODO: Implement AI-powered worksheet generation
+    # TODO: Implement AI-powered worksheet generation (blocking LLM/compute work; keep this handler sync)
+    short_answer = generate_text(
+        f"Write one short-answer question on {worksheet_request.subject} - {worksheet_request.topic} "
+        f"at difficulty {worksheet_request.difficulty_level} of 5."
+    ) or "Explain the concept with an example..."
     return {
         "worksheet_id": "worksheet_456",
         "title": f"{worksheet_request.subject} - {worksheet_request.topic} Practice",
@@ -195,7 +440,7 @@ async def generate_worksheet(worksheet_request: WorksheetRequest):
             {
                 "id": 2,
                 "type": "short_answer",
-                "question": "Explain the concept with an example...",
+                "question": short_answer,
                 "difficulty": worksheet_request.difficulty_level
             }
         ],
@@ -206,9 +451,9 @@ async def generate_worksheet(worksheet_request: WorksheetRequest):
     }
 
 @app.post("/api/worksheets/{worksheet_id}/submit")
-async def submit_worksheet(worksheet_id: str, answers: Dict[str, Any]):
+def submit_worksheet(worksheet_id: str, answers: Dict[str, Any]):
     """Submit worksheet answers and get AI feedback"""
-    # TODO: Implement answer evaluation and feedback generation
+    # TODO: Implement answer evaluation and feedback generation (blocking LLM/compute work; keep this handler sync)
     return {
         "worksheet_id": worksheet_id,
         "score": 85.0,
@@ -230,30 +475,45 @@ async def submit_worksheet(worksheet_id: str, answers: Dict[str, Any]):
 # Doubt Clearing Endpoints
 
 @app.post("/api/doubts/ask")
-async def ask_doubt(doubt_query: DoubtQueryRequest):
+def ask_doubt(doubt_query: DoubtQueryRequest):
     """Submit a doubt/question for AI-powered resolution"""
-    # TODO: Implement AI-powered doubt clearing
-    return {
-        "query_id": "doubt_789",
-        "student_id": doubt_query.student_id,
-        "question": doubt_query.question,
-        "ai_response": {
+    # Near-duplicate questions ("what is photosynthesis?") reuse an earlier answer
+    scope = (doubt_query.subject or "").strip().lower()
+    vector = from_thread.run(doubt_cache.embed, doubt_query.question)
+    ai_response = doubt_cache.lookup(vector, scope)
+    from_cache = ai_response is not None
+
+    if not from_cache:
+        # TODO: Implement AI-powered doubt clearing (blocking LLM/compute work; keep this handler sync)
+        content = generate_text(f"Answer this student's question clearly and simply: {doubt_query.question}")
+        ai_response = {
             "type": "explanation",
-            "content": "Here's a detailed explanation of your question...",
+            "content": content or "Here's a detailed explanation of your question...",
             "examples": ["Example 1: ...", "Example 2: ..."],
             "follow_up_questions": [
                 "Would you like me to explain this with a different approach?",
                 "Do you want to see more examples?"
             ]
-        },
+        }
+        # A placeholder answer from a failed call is never cached for the questions near this one
+        if content is not None:
+            doubt_cache.add(vector, ai_response, scope)
+
+    return {
+        "query_id": "doubt_789",
+        "student_id": doubt_query.student_id,
+        "question": doubt_query.question,
+        "ai_response": ai_response,
+        "from_cache": from_cache,
         "confidence_score": 0.92,
         "related_topics": ["Topic A", "Topic B"]
     }
 
-@app.get("/api/doubts/{query_id}")
+@app.get("/api/doubts/{query_id}", response_model=None)
+@cache(expire=60)
 async def get_doubt_resolution(query_id: str):
     """Get doubt resolution details"""
-    # TODO: Implement doubt tracking
+    # TODO: Implement doubt tracking (async DB driver; keep this handler async)
     return {
         "query_id": query_id,
         "status": "resolved",
@@ -264,10 +524,11 @@ async def get_doubt_resolution(query_id: str):
 
 # Analytics and Reporting Endpoints
 
-@app.get("/api/analytics/student/{student_id}")
-async def get_student_analytics(student_id: str, period: str = "monthly"):
+@app.get("/api/analytics/student/{student_id}", response_model=None)
+@cache(expire=300)
+def get_student_analytics(student_id: str, period: str = "monthly"):
     """Get comprehensive learning analytics for a student"""
-    # TODO: Implement analytics calculation
+    # TODO: Implement analytics calculation (blocking LLM/compute work; keep this handler sync)
     return {
         "student_id": student_id,
         "period": period,
@@ -289,10 +550,11 @@ async def get_student_analytics(student_id: str, period: str = "monthly"):
         ]
     }
 
-@app.get("/api/analytics/class/{grade}/{school_id}")
-async def get_class_analytics(grade: int, school_id: str):
+@app.get("/api/analytics/class/{grade}/{school_id}", response_model=None)
+@cache(expire=300)
+def get_class_analytics(grade: int, school_id: str):
     """Get class-level analytics for teachers"""
-    # TODO: Implement class analytics
+    # TODO: Implement class analytics (blocking LLM/compute work; keep this handler sync)
     return {
         "grade": grade,
         "school_id": school_id,
@@ -314,12 +576,21 @@ async def get_class_analytics(grade: int, school_id: str):
         ]
     }
 
-# Run the application
+# Run the application (development; the production image serves ai_main:app through gunicorn.conf.py)
 if __name__ == "__main__":
+    # Auto-reload only in development; elsewhere run WEB_CONCURRENCY workers. Access logs stay off:
+    # uvicorn's per-request log line costs more than most handlers here
+    development = os.getenv("ENVIRONMENT", "development") == "development"
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        port=int(os.getenv("PORT", "8000")),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        reload=development,
+        workers=None if development else int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1)),
+        access_log=False,
+        timeout_keep_alive=30,
+        backlog=4096,
+        log_level="info" if development else "warning"
     )
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+ASGI middleware shared by the AI Education Agent API apps
+"""
+
+from typing import Iterable
+
+class PreflightMiddleware:
+    """Answer CORS preflight requests before routing and the rest of the middleware stack.
+
+    Sends what CORSMiddleware would for an allowed origin (all methods, requested headers
+    echoed back, credentials allowed). Plain OPTIONS requests and disallowed origins fall
+    through to the app, so CORSMiddleware still rejects them as before.
+    """
+
+    def __init__(self, app, allow_origins: Iterable[str],
+                 allow_methods: Iterable[str] = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT"),
+                 max_age: int = 600):
+        self.app = app
+        self.allow_origins = frozenset(origin.encode("latin-1") for origin in allow_origins)
+        self._headers = [
+            (b"access-control-allow-methods", ", ".join(allow_methods).encode("latin-1")),
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"vary", b"Origin, Access-Control-Request-Method, Access-Control-Request-Headers"),
+            (b"content-length", b"0"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "OPTIONS":
+            origin = request_method = request_headers = None
+            for name, value in scope["headers"]:
+                if name == b"origin":
+                    origin = value
+                elif name == b"access-control-request-method":
+                    request_method = value
+                elif name == b"access-control-request-headers":
+                    request_headers = value
+
+            if request_method is not None and origin in self.allow_origins:
+                headers = [(b"access-control-allow-origin", origin), *self._headers]
+                if request_headers:
+                    headers.append((b"access-control-allow-headers", request_headers))
+                await send({"type": "http.response.start", "status": 204, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        await self.app(scope, receive, send)
@@ -3,146 +3,272 @@ Mock API Server for AI Education Agent
 Simple server to provide basic API responses for demo purposes
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import json
-import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import gzip
+import hashlib
+import os
+import signal
+import socket
+import orjson
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip covers clients without it
+    brotli = None
+
+# Every GET payload is constant, so serialize each one once at import
+ROOT_JSON = orjson.dumps({
+    "status": "online",
+    "message": "AI Education Agent API is running",
+    "version": "1.0.0",
+    "timestamp": "2024-01-01T12:00:00Z"
+}, option=orjson.OPT_INDENT_2)
+
+STUDENT_JSON = orjson.dumps({
+    "student_id": "STU001",
+    "name": "Priya Sharma",
+    "grade": 8,
+    "school_id": "GOV001",
+    "performance": {
+        "Mathematics": 85,
+        "Science": 78,
+        "English": 65,
+        "History": 72
+    },
+    "learning_style": "Visual",
+    "strengths": ["Mathematics", "Science"],
+    "focus_areas": ["English Grammar", "History"]
+}, option=orjson.OPT_INDENT_2)
+
+CHAT_JSON = orjson.dumps({
+    "response": "Hello! I'm your AI tutor. I can help you with any subject. What would you like to learn about today?",
+    "confidence": 0.95,
+    "suggestions": [
+        "Ask me about Mathematics concepts",
+        "Get help with Science experiments",
+        "Practice English grammar",
+        "Learn about Historical events"
+    ]
+}, option=orjson.OPT_INDENT_2)
+
+WORKSHEET_JSON = orjson.dumps({
+    "worksheet_id": "WS001",
+    "subject": "Mathematics",
+    "topic": "Algebra",
+    "difficulty": "medium",
+    "questions": [
+        {
+            "id": 1,
+            "question": "Solve for x: 2x + 5 = 13",
+            "type": "equation",
+            "points": 5
+        },
+        {
+            "id": 2,
+            "question": "If y = 3x - 2, find y when x = 4",
+            "type": "substitution",
+            "points": 5
+        }
+    ],
+    "estimated_time": "15 minutes"
+}, option=orjson.OPT_INDENT_2)
+
+NOT_FOUND_JSON = orjson.dumps({
+    "error": "Endpoint not found",
+    "available_endpoints": [
+        "/",
+        "/student/{id}",
+        "/ai/chat",
+        "/ai/worksheet"
+    ]
+}, option=orjson.OPT_INDENT_2)
+
+# POST replies echo the body back after these fixed fields
+POST_PREFIX = orjson.dumps({
+    "status": "success",
+    "message": "Data received successfully",
+    "timestamp": "2024-01-01T12:00:00Z"
+})[:-1] + b',"received_data":'
+
+MAX_BODY = 1 << 20
+
+# Set VERBOSE=1 to print an access line for every request
+VERBOSE = bool(os.getenv("VERBOSE"))
+
+# Status line and CORS headers, pre-encoded so a response is a single write. Every
+# response carries Content-Length so HTTP/1.1 clients can keep the connection open
+_CORS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization"
+}
+_CORS_HEADERS = b"".join(b"%s: %s\r\n" % (name.encode(), value.encode()) for name, value in _CORS.items())
+HEADER_BYTES = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n" + _CORS_HEADERS
+PREFLIGHT_BYTES = b"HTTP/1.1 200 OK\r\n" + _CORS_HEADERS + b"Content-Length: 0\r\n\r\n"
+
+def _response(body: bytes, headers: bytes = b"") -> bytes:
+    return HEADER_BYTES + headers + b"Content-Length: %d\r\n\r\n" % len(body) + body
+
+# Content codings offered for constant payloads, in order of preference. Bodies are
+# compressed once at import, so the slow top quality settings cost nothing per request
+_ENCODERS = {"gzip": lambda body: gzip.compress(body, 9, mtime=0)}
+if brotli is not None:
+    _ENCODERS = {"br": lambda body: brotli.compress(body, quality=11), **_ENCODERS}
+
+def _variant(body: bytes, etag: str, headers: bytes = b""):
+    """ETag, full 200 response and 304 response for one encoding of a payload"""
+    validators = (headers + b"ETag: " + etag.encode()
+                  + b"\r\nCache-Control: public, max-age=30\r\nVary: Accept-Encoding\r\n")
+    not_modified = b"HTTP/1.1 304 Not Modified\r\n" + _CORS_HEADERS + validators + b"\r\n"
+    return etag, _response(body, validators), not_modified
+
+def _static(body: bytes):
+    """Pre-built responses for a constant GET payload, keyed by content coding ("" is identity)"""
+    digest = hashlib.blake2s(body, digest_size=8).hexdigest()
+    variants = {"": _variant(body, f'"{digest}"')}
+    for coding, compress in _ENCODERS.items():
+        compressed = compress(body)
+        # Tiny payloads can grow when compressed; those are only served as-is
+        if len(compressed) < len(body):
+            variants[coding] = _variant(
+                compressed, f'"{digest}-{coding}"', b"Content-Encoding: %s\r\n" % coding.encode()
+            )
+    return variants
+
+# Complete GET responses, headers included
+_ROUTES = {
+    '/': _static(ROOT_JSON),
+    '/ai/chat': _static(CHAT_JSON),
+    '/ai/worksheet': _static(WORKSHEET_JSON)
+}
+STUDENT_ROUTE = _static(STUDENT_JSON)
+NOT_FOUND_ROUTE = _static(NOT_FOUND_JSON)
 
 class MockAPIHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests; idle ones are dropped after the timeout
+    protocol_version = "HTTP/1.1"
+    timeout = 30
+
+    # Responses are one small write; don't let Nagle hold them back
+    disable_nagle_algorithm = True
+
+    # send_error() replies in JSON like every other endpoint
+    error_content_type = 'application/json'
+    error_message_format = '{"error": "%(message)s", "code": %(code)d}'
+
+    def end_headers(self):
+        # Only send_error() goes through send_header(); give its replies the CORS headers too
+        for name, value in _CORS.items():
+            self.send_header(name, value)
+        super().end_headers()
+
     def do_GET(self):
-        # Parse the URL
-        parsed_path = urllib.parse.urlparse(self.path)
-        
-        # Set CORS headers
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.end_headers()
-        
-        # Root endpoint - health check
-        if parsed_path.path == '/':
-            response = {
-                "status": "online",
-                "message": "AI Education Agent API is running",
-                "version": "1.0.0",
-                "timestamp": "2024-01-01T12:00:00Z"
-            }
-        
-        # Student profile endpoint
-        elif parsed_path.path.startswith('/student/'):
-            response = {
-                "student_id": "STU001",
-                "name": "Priya Sharma",
-                "grade": 8,
-                "school_id": "GOV001",
-                "performance": {
-                    "Mathematics": 85,
-                    "Science": 78,
-                    "English": 65,
-                    "History": 72
-                },
-                "learning_style": "Visual",
-                "strengths": ["Mathematics", "Science"],
-                "focus_areas": ["English Grammar", "History"]
-            }
-        
-        # AI chat endpoint
-        elif parsed_path.path == '/ai/chat':
-            response = {
-                "response": "Hello! I'm your AI tutor. I can help you with any subject. What would you like to learn about today?",
-                "confidence": 0.95,
-                "suggestions": [
-                    "Ask me about Mathematics concepts",
-                    "Get help with Science experiments", 
-                    "Practice English grammar",
-                    "Learn about Historical events"
-                ]
-            }
-        
-        # Worksheet generation endpoint
-        elif parsed_path.path == '/ai/worksheet':
-            response = {
-                "worksheet_id": "WS001",
-                "subject": "Mathematics",
-                "topic": "Algebra",
-                "difficulty": "medium",
-                "questions": [
-                    {
-                        "id": 1,
-                        "question": "Solve for x: 2x + 5 = 13",
-                        "type": "equation",
-                        "points": 5
-                    },
-                    {
-                        "id": 2, 
-                        "question": "If y = 3x - 2, find y when x = 4",
-                        "type": "substitution",
-                        "points": 5
-                    }
-                ],
-                "estimated_time": "15 minutes"
-            }
-        
-        # Default response
-        else:
-            response = {
-                "error": "Endpoint not found",
-                "available_endpoints": [
-                    "/",
-                    "/student/{id}",
-                    "/ai/chat",
-                    "/ai/worksheet"
-                ]
-            }
-        
-        # Send JSON response
-        self.wfile.write(json.dumps(response, indent=2).encode())
+        # Drop the query string; routing only looks at the path
+        path = self.path.partition('?')[0]
+
+        # Exact routes are one dict lookup; student profiles are the only prefix route
+        route = _ROUTES.get(path)
+        if route is None:
+            route = STUDENT_ROUTE if path.startswith('/student/') else NOT_FOUND_ROUTE
+        accept_encoding = self.headers.get('Accept-Encoding', '')
+        coding = next((c for c in _ENCODERS if c in accept_encoding and c in route), "")
+        etag, response, not_modified = route[coding]
+
+        # Clients revalidating a body they already hold get an empty 304
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and (if_none_match == '*' or etag in if_none_match):
+            self.log_request(304)
+            self.wfile.write(not_modified)
+            return
+
+        self.log_request(200)
+        self.wfile.write(response)
     
     def do_POST(self):
-        # Handle POST requests
-        content_length = int(self.headers['Content-Length'])
-        post_data = self.rfile.read(content_length)
-        
-        # Set CORS headers
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.end_headers()
-        
+        # Handle POST requests; bodies are capped and read straight into one buffer
+        try:
+            content_length = int(self.headers['Content-Length'] or 0)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            self.send_error(400, "Invalid Content-Length")
+            return
+        if content_length > MAX_BODY:
+            self.send_error(413)
+            return
+
+        body = bytearray(content_length)
+        view = memoryview(body)
+        received = 0
+        while received < content_length:
+            n = self.rfile.readinto(view[received:])
+            if not n:
+                break
+            received += n
+
         # Parse JSON data
         try:
-            data = json.loads(post_data.decode())
-        except:
-            data = {}
-        
-        # Mock response for POST requests
-        response = {
-            "status": "success",
-            "message": "Data received successfully",
-            "received_data": data,
-            "timestamp": "2024-01-01T12:00:00Z"
-        }
-        
-        self.wfile.write(json.dumps(response, indent=2).encode())
+            data = orjson.loads(body) if content_length else {}
+        except orjson.JSONDecodeError:
+            self.send_error(400, "Invalid JSON body")
+            return
+
+        # Mock response for POST requests: fixed fields are pre-encoded, only the echo is serialized
+        self.log_request(200)
+        self.wfile.write(_response(POST_PREFIX + orjson.dumps(data) + b"}"))
     
     def do_OPTIONS(self):
         # Handle preflight requests
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
-        self.end_headers()
+        self.log_request(200)
+        self.wfile.write(PREFLIGHT_BYTES)
     
+    def log_request(self, code='-', size='-'):
+        # Per-request access lines are opt-in; errors still go through log_message
+        if VERBOSE:
+            super().log_request(code, size)
+
     def log_message(self, format, *args):
         # Custom logging
         print(f"[API] {format % args}")
 
+class MockHTTPServer(ThreadingHTTPServer):
+    """Thread-per-connection server whose port can be shared by pre-forked workers"""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 4096
+
+    def server_bind(self):
+        if hasattr(socket, "SO_REUSEPORT"):
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+def _worker_count():
+    # Pre-forking needs fork() and SO_REUSEPORT so the kernel can spread connections
+    if not hasattr(os, "fork") or not hasattr(socket, "SO_REUSEPORT"):
+        return 1
+    return int(os.getenv("MOCK_SERVER_WORKERS", os.cpu_count() or 1))
+
 def run_server():
     server_address = ('', 8000)
-    httpd = HTTPServer(server_address, MockAPIHandler)
+
+    # Fork the extra workers; each binds its own socket to the shared port
+    is_parent = True
+    children = []
+    for _ in range(_worker_count() - 1):
+        pid = os.fork()
+        if pid == 0:
+            is_parent = False
+            break
+        children.append(pid)
+
+    httpd = MockHTTPServer(server_address, MockAPIHandler)
+    if not is_parent:
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            httpd.server_close()
+        return
+
     print("🚀 Mock AI Education Agent API Server starting...")
     print("📡 Server running at: http://localhost:8000")
     print("🔗 Health check: http://localhost:8000/")
@@ -159,6 +285,9 @@ def run_server():
     except KeyboardInterrupt:
         print("\n🛑 Server stopped.")
         httpd.server_close()
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
 
 if __name__ == '__main__':
     run_server()
@@ -5,96 +5,164 @@ A simplified version to get started quickly
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Dict, Any, Tuple
+from functools import lru_cache
+from types import MappingProxyType
+import itertools
 import os
+import string
+import sys
+import time
+import orjson
+from contextlib import asynccontextmanager
+import db
+from middleware import PreflightMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await db.init_models()
+    yield
+    await db.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Education Agent - Simple Version",
     description="Basic version of the personalized learning system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
+CORS_ORIGINS = ["http://localhost:3000", "http://localhost:3001"]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress larger JSON bodies (analytics, worksheets) for clients that accept gzip
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
+# Added last so it wraps everything: preflights are answered before CORSMiddleware and routing
+app.add_middleware(PreflightMiddleware, allow_origins=CORS_ORIGINS)
+
 # Simple data models
 class StudentProfile(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     student_id: str
     name: str
     grade: int
     school_id: str
     current_level: float = 50.0
-    strengths: List[str] = []
-    weaknesses: List[str] = []
+    strengths: List[str] = Field(default_factory=list)
+    weaknesses: List[str] = Field(default_factory=list)
     learning_style: str = "visual"
 
-# In-memory storage (for demo purposes)
-students_db = {}
-sessions_db = {}
+# Postgres when DATABASE_URL is set, Redis when REDIS_URL is; in-memory dicts otherwise (demo mode)
+store = db.get_store()
+
+# ISO timestamp shared by every response within the same second
+_ts_cache = ["", 0]
+
+def now_iso() -> str:
+    """Current UTC time as an ISO-8601 string, reformatted at most once per second"""
+    now = int(time.time())
+    if _ts_cache[1] != now:
+        _ts_cache[0] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+        _ts_cache[1] = now
+    return _ts_cache[0]
+
+# Ids are a per-process counter in base62, behind a prefix that differs per worker
+# process so workers sharing the database don't hand out the same id
+_ALPHABET = string.digits + string.ascii_letters
+_id_counter = itertools.count(1)
+
+def _b62(n: int) -> str:
+    digits = []
+    while n:
+        n, r = divmod(n, 62)
+        digits.append(_ALPHABET[r])
+    return "".join(reversed(digits)) or "0"
+
+_ID_PREFIX = _b62(time.time_ns())
+
+def new_id(kind: str) -> str:
+    return f"{kind}_{_ID_PREFIX}{_b62(next(_id_counter))}"
 
 # API Routes
-@app.get("/")
+# Probe payloads encoded once at import; per request only the time is added
+_ROOT_PREFIX = orjson.dumps({
+    "message": "🎓 AI Education Agent API",
+    "status": "running",
+    "version": "1.0.0",
+    "features": [
+        "Student Profiles",
+        "Learning Sessions",
+        "Progress Tracking",
+        "Basic Analytics"
+    ]
+})[:-1] + b',"timestamp":"'
+
+_HEALTH_PREFIX = orjson.dumps({
+    "status": "healthy",
+    "service": "AI Education Agent"
+})[:-1] + b',"timestamp":"'
+
+@app.get("/", response_model=None)
 async def root():
     """Welcome endpoint"""
-    return {
-        "message": "🎓 AI Education Agent API",
-        "status": "running",
-        "version": "1.0.0",
-        "timestamp": datetime.utcnow().isoformat(),
-        "features": [
-            "Student Profiles",
-            "Learning Sessions",
-            "Progress Tracking",
-            "Basic Analytics"
-        ]
-    }
+    return Response(_ROOT_PREFIX + now_iso().encode() + b'"}', media_type="application/json")
 
-@app.get("/health")
+@app.get("/health", response_model=None)
 async def health_check():
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": "AI Education Agent",
-        "timestamp": datetime.utcnow().isoformat(),
-        "students_count": len(students_db),
-        "sessions_count": len(sessions_db)
-    }
+    # Liveness only: probes hit this many times a second, so it never waits on the database
+    return Response(_HEALTH_PREFIX + now_iso().encode() + b'"}', media_type="application/json")
 
-@app.post("/api/students")
+@app.get("/api/stats", response_model=None)
+async def get_stats():
+    """Student and session counts (a count query each against Postgres or Redis)"""
+    return ORJSONResponse({
+        "students_count": await store.count_students(),
+        "sessions_count": await store.count_sessions()
+    })
+
+# Dict-returning handlers hand back an ORJSONResponse themselves: a plain dict would first
+# be walked by FastAPI's pure-Python jsonable_encoder before orjson ever saw it
+@app.post("/api/students", response_model=None)
 async def create_student(student: StudentProfile):
     """Create a new student profile"""
-    students_db[student.student_id] = student.dict()
-    return {
+    await store.add_student(student.model_dump())
+    return ORJSONResponse({
         "message": "Student profile created successfully",
         "student_id": student.student_id,
         "status": "created"
-    }
+    })
 
-@app.get("/api/students/{student_id}")
+@app.get("/api/students/{student_id}", response_model=None)
 async def get_student(student_id: str):
     """Get student profile"""
-    if student_id not in students_db:
-        return {"error": "Student not found"}
+    student = await store.get_student(student_id)
+    if student is None:
+        return ORJSONResponse({"error": "Student not found"})
 
-    student = students_db[student_id]
-    return {
+    return ORJSONResponse({
         "student": student,
-        "recent_sessions": [s for s in sessions_db.values() if s["student_id"] == student_id]
-    }
+        "recent_sessions": await store.sessions_for(student_id)
+    })
 
-@app.post("/api/learning-sessions")
+@app.post("/api/learning-sessions", response_model=None)
 async def start_learning_session(session_data: dict):
     """Start a new learning session"""
-    session_id = f"session_{len(sessions_db) + 1}"
+    session_id = new_id("session")
 
     session = {
         "session_id": session_id,
@@ -103,7 +171,7 @@ async def start_learning_session(session_data: dict):
         "topic": session_data.get("topic"),
         "progress": 0.0,
         "status": "in_progress",
-        "started_at": datetime.utcnow().isoformat(),
+        "started_at": now_iso(),
         "personalized_content": {
             "difficulty_level": 3,
             "learning_style_adaptation": "visual",
@@ -122,172 +190,206 @@ async def start_learning_session(session_data: dict):
         }
     }
 
-    sessions_db[session_id] = session
-    return session
+    await store.add_session(session)
+    return ORJSONResponse(session)
 
-@app.post("/api/worksheets/generate")
-async def generate_worksheet(request_data: dict):
-    """Generate a simple worksheet"""
-    subject = request_data.get('subject', 'mathematics').lower()
-    topic = request_data.get('topic', 'General')
-    question_type = request_data.get('type', 'mixed')
-    num_questions = int(request_data.get('questions', 10))
-
-    # Subject-specific question templates
-    question_templates = {
-        'mathematics': {
-            'mcq': [
-                {
-                    "question": "What is the value of x in the equation 2x + 5 = 13?",
-                    "options": ["A) x = 3", "B) x = 4", "C) x = 5", "D) x = 6"],
-                    "correct_answer": "B"
-                },
-                {
-                    "question": "If y = 3x - 2, what is the value of y when x = 4?",
-                    "options": ["A) y = 8", "B) y = 10", "C) y = 12", "D) y = 14"],
-                    "correct_answer": "B"
-                },
-                {
-                    "question": "What is the simplified form of 4(x + 3) - 2x?",
-                    "options": ["A) 2x + 12", "B) 4x + 12", "C) 2x + 3", "D) 6x + 12"],
-                    "correct_answer": "A"
-                }
-            ],
-            'short': [
-                "Solve for x: 2x + 5 = 13. Show your work step by step.",
-                "If y = 3x - 2, find y when x = 4. Explain your calculation.",
-                "Simplify: 4(x + 3) - 2x. Show each step of the simplification."
-            ]
-        },
-        'science': {
-            'mcq': [
-                {
-                    "question": "What is the primary function of mitochondria in a cell?",
-                    "options": ["A) Protein synthesis", "B) Energy production", "C) DNA storage", "D) Waste removal"],
-                    "correct_answer": "B"
-                },
-                {
-                    "question": "Which process do plants use to make their own food?",
-                    "options": ["A) Respiration", "B) Digestion", "C) Photosynthesis", "D) Transpiration"],
-                    "correct_answer": "C"
-                },
-                {
-                    "question": "What are the three main states of matter?",
-                    "options": ["A) Hot, cold, warm", "B) Solid, liquid, gas", "C) Big, medium, small", "D) Fast, slow, still"],
-                    "correct_answer": "B"
-                }
-            ],
-            'short': [
-                "Explain the function of mitochondria in a cell and why they are called 'powerhouses'.",
-                "Describe the process of photosynthesis and explain why it's important for life on Earth.",
-                "List the three states of matter and give two examples of each state."
-            ]
-        },
-        'history': {
-            'mcq': [
-                {
-                    "question": "Who was the first Prime Minister of India?",
-                    "options": ["A) Mahatma Gandhi", "B) Jawaharlal Nehru", "C) Sardar Patel", "D) Dr. Rajendra Prasad"],
-                    "correct_answer": "B"
-                },
-                {
-                    "question": "In which year did India gain independence?",
-                    "options": ["A) 1945", "B) 1946", "C) 1947", "D) 1948"],
-                    "correct_answer": "C"
-                },
-                {
-                    "question": "Which movement was led by Mahatma Gandhi for Indian independence?",
-                    "options": ["A) Quit India Movement", "B) Khilafat Movement", "C) Swadeshi Movement", "D) All of the above"],
-                    "correct_answer": "D"
-                }
-            ],
-            'short': [
-                "Name the first Prime Minister of India and describe one of his major contributions.",
-                "Explain the significance of August 15, 1947, in Indian history.",
-                "List three important leaders of the Indian freedom struggle and their contributions."
-            ]
-        }
+# Subject-specific question templates, read-only so shared state can't drift between requests
+QUESTION_TEMPLATES = MappingProxyType({
+    'mathematics': {
+        'mcq': (
+            {
+                "question": "What is the value of x in the equation 2x + 5 = 13?",
+                "options": ("A) x = 3", "B) x = 4", "C) x = 5", "D) x = 6"),
+                "correct_answer": "B"
+            },
+            {
+                "question": "If y = 3x - 2, what is the value of y when x = 4?",
+                "options": ("A) y = 8", "B) y = 10", "C) y = 12", "D) y = 14"),
+                "correct_answer": "B"
+            },
+            {
+                "question": "What is the simplified form of 4(x + 3) - 2x?",
+                "options": ("A) 2x + 12", "B) 4x + 12", "C) 2x + 3", "D) 6x + 12"),
+                "correct_answer": "A"
+            }
+        ),
+        'short': (
+            "Solve for x: 2x + 5 = 13. Show your work step by step.",
+            "If y = 3x - 2, find y when x = 4. Explain your calculation.",
+            "Simplify: 4(x + 3) - 2x. Show each step of the simplification."
+        )
+    },
+    'science': {
+        'mcq': (
+            {
+                "question": "What is the primary function of mitochondria in a cell?",
+                "options": ("A) Protein synthesis", "B) Energy production", "C) DNA storage", "D) Waste removal"),
+                "correct_answer": "B"
+            },
+            {
+                "question": "Which process do plants use to make their own food?",
+                "options": ("A) Respiration", "B) Digestion", "C) Photosynthesis", "D) Transpiration"),
+                "correct_answer": "C"
+            },
+            {
+                "question": "What are the three main states of matter?",
+                "options": ("A) Hot, cold, warm", "B) Solid, liquid, gas", "C) Big, medium, small", "D) Fast, slow, still"),
+                "correct_answer": "B"
+            }
+        ),
+        'short': (
+            "Explain the function of mitochondria in a cell and why they are called 'powerhouses'.",
+            "Describe the process of photosynthesis and explain why it's important for life on Earth.",
+            "List the three states of matter and give two examples of each state."
+        )
+    },
+    'history': {
+        'mcq': (
+            {
+                "question": "Who was the first Prime Minister of India?",
+                "options": ("A) Mahatma Gandhi", "B) Jawaharlal Nehru", "C) Sardar Patel", "D) Dr. Rajendra Prasad"),
+                "correct_answer": "B"
+            },
+            {
+                "question": "In which year did India gain independence?",
+                "options": ("A) 1945", "B) 1946", "C) 1947", "D) 1948"),
+                "correct_answer": "C"
+            },
+            {
+                "question": "Which movement was led by Mahatma Gandhi for Indian independence?",
+                "options": ("A) Quit India Movement", "B) Khilafat Movement", "C) Swadeshi Movement", "D) All of the above"),
+                "correct_answer": "D"
+            }
+        ),
+        'short': (
+            "Name the first Prime Minister of India and describe one of his major contributions.",
+            "Explain the significance of August 15, 1947, in Indian history.",
+            "List three important leaders of the Indian freedom struggle and their contributions."
+        )
     }
+})
 
-    # Generate problems based on type
-    problems = []
-    templates = question_templates.get(subject, question_templates['mathematics'])
-
-    for i in range(min(num_questions, 3)):  # Limit to 3 for demo
-        if question_type == 'mcq' or question_type == 'multiple_choice':
-            mcq_template = templates['mcq'][i % len(templates['mcq'])]
-            problems.append({
-                "id": i + 1,
-                "type": "multiple_choice",
-                "question": mcq_template["question"],
-                "options": mcq_template["options"],
-                "correct_answer": mcq_template["correct_answer"]
-            })
-        elif question_type == 'short':
-            problems.append({
-                "id": i + 1,
-                "type": "short_answer",
-                "question": templates['short'][i % len(templates['short'])],
-                "expected_length": "2-3 sentences"
-            })
-        else:  # mixed
-            if i % 2 == 0:  # MCQ for even indices
-                mcq_template = templates['mcq'][i % len(templates['mcq'])]
-                problems.append({
-                    "id": i + 1,
-                    "type": "multiple_choice",
-                    "question": mcq_template["question"],
-                    "options": mcq_template["options"],
-                    "correct_answer": mcq_template["correct_answer"]
-                })
-            else:  # Short answer for odd indices
-                problems.append({
-                    "id": i + 1,
-                    "type": "short_answer",
-                    "question": templates['short'][i % len(templates['short'])],
-                    "expected_length": "2-3 sentences"
-                })
+# Worksheet content depends only on these arguments, so repeats are served from the cache.
+# Callers get shared objects and must not mutate them.
+def _mcq_problem(number: int, template: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": number,
+        "type": "multiple_choice",
+        "question": template["question"],
+        "options": template["options"],
+        "correct_answer": template["correct_answer"]
+    }
 
+def _short_problem(number: int, question: str) -> Dict[str, Any]:
     return {
-        "worksheet_id": f"worksheet_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        "id": number,
+        "type": "short_answer",
+        "question": question,
+        "expected_length": "2-3 sentences"
+    }
+
+_QUESTION_KINDS = MappingProxyType({'mcq': 'mcq', 'multiple_choice': 'mcq', 'short': 'short'})
+
+@lru_cache(maxsize=4096)
+def _problems(subject: str, question_type: str, count: int) -> Tuple[Dict[str, Any], ...]:
+    """Build worksheet problems based on type"""
+    templates = QUESTION_TEMPLATES.get(subject, QUESTION_TEMPLATES['mathematics'])
+    kind = _QUESTION_KINDS.get(question_type, 'mixed')
+
+    # Problem n uses the n-th template of each kind, wrapping around the template lists
+    numbered = zip(range(1, count + 1), itertools.cycle(templates['mcq']), itertools.cycle(templates['short']))
+    if kind == 'mcq':
+        return tuple(_mcq_problem(n, mcq) for n, mcq, _ in numbered)
+    if kind == 'short':
+        return tuple(_short_problem(n, short) for n, _, short in numbered)
+    # Mixed: odd-numbered problems are MCQ, even-numbered are short answer
+    return tuple(_mcq_problem(n, mcq) if n % 2 else _short_problem(n, short) for n, mcq, short in numbered)
+
+@lru_cache(maxsize=4096)
+def _objectives(subject: str, topic: str) -> Tuple[str, ...]:
+    return (
+        f"Understand basic concepts of {topic}",
+        f"Apply {topic} knowledge in practical scenarios",
+        f"Build confidence in {subject}"
+    )
+
+@lru_cache(maxsize=1024)
+def _worksheet_body(subject: str, topic: str, question_type: str, num_questions: int,
+                    difficulty: bytes) -> bytes:
+    """Encoded worksheet for one request signature, minus the leading worksheet_id"""
+    return orjson.dumps({
         "title": f"{subject.title()} - {topic} Practice",
-        "difficulty_level": request_data.get("difficulty_level", 3),
+        "difficulty_level": orjson.Fragment(difficulty),
         "estimated_time_minutes": num_questions * 3,
-        "problems": problems,
-        "learning_objectives": [
-            f"Understand basic concepts of {topic}",
-            f"Apply {topic} knowledge in practical scenarios",
-            f"Build confidence in {subject}"
-        ]
-    }
+        # Generate problems based on type
+        "problems": _problems(subject, question_type, min(num_questions, 3)),  # Limit to 3 for demo
+        "learning_objectives": _objectives(subject, topic)
+    })[1:]
+
+@app.post("/api/worksheets/generate", response_model=None)
+async def generate_worksheet(request_data: dict):
+    """Generate a simple worksheet"""
+    subject = request_data.get('subject', 'mathematics').lower()
+    # Memo keys must be hashable: a list or object sent as topic or type is used in its str()
+    # form, which is how the f-strings below render it anyway
+    topic = str(request_data.get('topic', 'General'))
+    question_type = str(request_data.get('type', 'mixed'))
+    num_questions = int(request_data.get('questions', 10))
+    # Encoded up front so any JSON value can be part of the memo key
+    difficulty = orjson.dumps(request_data.get("difficulty_level", 3))
+
+    # Templates are static, so the body only varies with the request; just the id is new
+    body = _worksheet_body(subject, topic, question_type, num_questions, difficulty)
+    return Response(
+        b'{"worksheet_id":"' + new_id("worksheet").encode() + b'",' + body,
+        media_type="application/json"
+    )
 
-@app.post("/api/doubts/ask")
+# Doubt replies share these fixed lists; they don't depend on the question
+_DOUBT_EXAMPLES = (
+    "Example 1: Think of it like...",
+    "Example 2: Another way to look at it is..."
+)
+_DOUBT_FOLLOW_UPS = (
+    "Would you like me to explain this with a different approach?",
+    "Do you want to see more examples?"
+)
+
+@app.post("/api/doubts/ask", response_model=None)
 async def ask_doubt(doubt_data: dict):
     """Simple doubt clearing"""
     question = doubt_data.get("question", "")
 
-    return {
-        "query_id": f"doubt_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+    return ORJSONResponse({
+        "query_id": new_id("doubt"),
         "question": question,
         "ai_response": {
             "type": "explanation",
             "content": f"Great question! Let me help you understand this concept. {question} is an important topic that requires step-by-step understanding...",
-            "examples": [
-                "Example 1: Think of it like...",
-                "Example 2: Another way to look at it is..."
-            ],
-            "follow_up_questions": [
-                "Would you like me to explain this with a different approach?",
-                "Do you want to see more examples?"
-            ]
+            "examples": _DOUBT_EXAMPLES,
+            "follow_up_questions": _DOUBT_FOLLOW_UPS
         },
         "confidence_score": 0.85,
         "related_topics": ["Related Topic 1", "Related Topic 2"]
-    }
+    })
 
+# Development entrypoint; the production image serves ai_main:app through gunicorn.conf.py
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting AI Education Agent...")
     print("📚 Access the API at: http://localhost:8000")
     print("📖 API Documentation: http://localhost:8000/docs")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    development = os.getenv("ENVIRONMENT", "development") == "development"
+    uvicorn.run(
+        "simple_main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # Workers share state through Postgres or Redis; see db.get_store
+        workers=None if development else int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1)),
+        access_log=False,
+        timeout_keep_alive=30,
+        backlog=4096,
+        log_level="info" if development else "warning"
+    )
\ No newline at end of file
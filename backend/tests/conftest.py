@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The API modules import each other as top-level modules (e.g. `import db`), as they do when
+# the service runs from the backend directory
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+# Tests run against the in-process store and without OpenAI; set before the modules' load_dotenv()
+# runs, which never overrides variables already set, so the repo's .env cannot point them elsewhere
+for name in ("DATABASE_URL", "REDIS_URL", "OPENAI_API_KEY"):
+    os.environ[name] = ""
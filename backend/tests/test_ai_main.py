@@ -0,0 +1,61 @@
+import orjson
+import pytest
+
+import ai_main
+from ai_main import _compute_analysis, _stream_ai_content
+
+def generator(*items):
+    """A generate() callable streaming `items`, raising any that are exceptions"""
+    async def generate():
+        for item in items:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    return generate
+
+async def events(response):
+    received = []
+    async for raw in response.body_iterator:
+        event, data = raw.decode().strip().split("\n")
+        received.append((event[len("event: "):], orjson.loads(data[len("data: "):])))
+    return received
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    ai_main.ai_content_cache.clear()
+
+@pytest.mark.asyncio
+async def test_complete_stream_is_cached_and_reported():
+    completed = []
+    response = _stream_ai_content({"id": 1}, ("key",), generator("Hello ", "world"), "fallback", completed.append)
+    assert await events(response) == [
+        ("metadata", {"id": 1}), ("content", "Hello "), ("content", "world"), ("done", {})
+    ]
+    assert ai_main.ai_content_cache[("key",)] == "Hello world"
+    assert completed == ["Hello world"]
+
+@pytest.mark.asyncio
+async def test_interrupted_stream_ends_with_error_and_is_not_kept():
+    completed = []
+    response = _stream_ai_content({}, ("key",), generator("Hello ", RuntimeError("reset")), "fallback",
+                                  completed.append)
+    assert await events(response) == [
+        ("metadata", {}), ("content", "Hello "), ("error", {"detail": "AI content stream was interrupted"})
+    ]
+    assert ("key",) not in ai_main.ai_content_cache
+    assert completed == []
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("generate", [generator(RuntimeError("reset")), generator(), None])
+async def test_failed_or_empty_stream_sends_fallback_uncached(generate):
+    response = _stream_ai_content({}, ("key",), generate, "fallback")
+    assert await events(response) == [("metadata", {}), ("content", "fallback"), ("done", {})]
+    assert ("key",) not in ai_main.ai_content_cache
+
+def test_records_without_max_score_are_left_out_of_averages():
+    analysis = _compute_analysis({"academic_history": [
+        {"subject": "Math", "score": 40, "max_score": 50},
+        {"subject": "Math", "score": 5, "max_score": 0},
+        {"subject": "Art", "score": 3, "max_score": 0},
+    ]})
+    assert analysis["subject_performance"] == {"Math": 80.0}
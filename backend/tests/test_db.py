@@ -0,0 +1,70 @@
+import pytest
+
+from db import CachedStore, MemoryStore
+
+class FakeRedis:
+    """The get/set/delete subset of redis.asyncio that CachedStore uses, on a dict"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expiry[key] = ex
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+class CountingStore(MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def get_student(self, student_id):
+        self.reads += 1
+        return await super().get_student(student_id)
+
+    async def sessions_for(self, student_id):
+        self.reads += 1
+        return await super().sessions_for(student_id)
+
+@pytest.fixture
+def cached():
+    store = CachedStore(CountingStore(), "redis://localhost:6379/0", ttl=300, miss_ttl=60)
+    store.redis = FakeRedis()
+    return store
+
+@pytest.mark.asyncio
+async def test_reads_are_served_from_cache(cached):
+    await cached.add_student({"student_id": "s1", "name": "Asha"})
+    assert await cached.get_student("s1") == {"student_id": "s1", "name": "Asha"}
+    assert await cached.get_student("s1") == {"student_id": "s1", "name": "Asha"}
+    assert cached.store.reads == 1
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_the_cached_student(cached):
+    await cached.add_student({"student_id": "s1", "name": "Asha"})
+    await cached.get_student("s1")
+    await cached.add_student({"student_id": "s1", "name": "Asha K"})
+    assert (await cached.get_student("s1"))["name"] == "Asha K"
+
+@pytest.mark.asyncio
+async def test_new_session_invalidates_the_students_sessions(cached):
+    await cached.add_session({"session_id": "a", "student_id": "s1"})
+    assert len(await cached.sessions_for("s1")) == 1
+    await cached.add_session({"session_id": "b", "student_id": "s1"})
+    assert [session["session_id"] for session in await cached.sessions_for("s1")] == ["a", "b"]
+
+@pytest.mark.asyncio
+async def test_misses_are_cached_briefly_until_the_student_is_added(cached):
+    assert await cached.get_student("s2") is None
+    assert await cached.get_student("s2") is None
+    assert cached.store.reads == 1
+    assert cached.redis.expiry["agentminds:cache:student:s2"] == 60
+
+    await cached.add_student({"student_id": "s2"})
+    assert await cached.get_student("s2") == {"student_id": "s2"}
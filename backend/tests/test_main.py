@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import main
+from main import BatchingDispatcher, SemanticCache
+
+@pytest.mark.asyncio
+async def test_dispatcher_batches_concurrent_prompts():
+    batches = []
+
+    async def complete_batch(prompts):
+        batches.append(len(prompts))
+        await asyncio.sleep(0.01)
+        return [prompt.upper() for prompt in prompts]
+
+    dispatcher = BatchingDispatcher(complete_batch, max_batch=4, window_seconds=0.05)
+    dispatcher.start()
+    results = await asyncio.gather(*(dispatcher.submit(f"p{i}") for i in range(10)))
+    await dispatcher.stop()
+
+    assert results == [f"P{i}" for i in range(10)]
+    assert batches == [4, 4, 2]
+    assert not dispatcher._dispatches
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_batches_in_flight():
+    release = asyncio.Event()
+
+    async def complete_batch(prompts):
+        await release.wait()
+        return prompts
+
+    dispatcher = BatchingDispatcher(complete_batch, window_seconds=0)
+    dispatcher.start()
+    pending = asyncio.ensure_future(dispatcher.submit("p"))
+    while not dispatcher._dispatches:
+        await asyncio.sleep(0)
+
+    stopping = asyncio.ensure_future(dispatcher.stop())
+    await asyncio.sleep(0)
+    assert not stopping.done()
+    release.set()
+    await stopping
+    assert await pending == "p"
+
+@pytest.mark.asyncio
+async def test_dispatcher_fails_every_caller_in_a_failed_batch():
+    async def complete_batch(prompts):
+        raise RuntimeError("upstream down")
+
+    dispatcher = BatchingDispatcher(complete_batch, window_seconds=0.01)
+    dispatcher.start()
+    results = await asyncio.gather(dispatcher.submit("a"), dispatcher.submit("b"), return_exceptions=True)
+    await dispatcher.stop()
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+@pytest.fixture
+def embeddings(monkeypatch):
+    vectors = {"what is force": [1.0, 0.0], "define force": [0.98, 0.1], "what is a noun": [0.0, 1.0]}
+
+    async def create(model, input):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=vectors[input])])
+
+    monkeypatch.setattr(main, "openai_client", SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+
+@pytest.mark.asyncio
+async def test_semantic_cache_matches_paraphrases_within_a_subject(embeddings):
+    cache = SemanticCache()
+    cache.add(await cache.embed("what is force"), {"answer": "a push or pull"}, "physics")
+
+    assert cache.lookup(await cache.embed("define force"), "physics") == {"answer": "a push or pull"}
+    assert cache.lookup(await cache.embed("define force"), "chemistry") is None
+    assert cache.lookup(await cache.embed("what is a noun"), "physics") is None
+
+@pytest.mark.asyncio
+async def test_semantic_cache_evicts_least_recently_hit(embeddings):
+    cache = SemanticCache(max_entries=2)
+    force, noun = await cache.embed("what is force"), await cache.embed("what is a noun")
+    cache.add(force, {"answer": "force"})
+    cache.add(noun, {"answer": "noun"})
+    cache.lookup(force)
+    cache.add(np.array([0.6, 0.8], dtype=np.float32), {"answer": "other"})
+
+    assert cache.lookup(force) == {"answer": "force"}
+    assert cache.lookup(noun) is None
+
+@pytest.mark.asyncio
+async def test_semantic_cache_misses_without_a_client(monkeypatch):
+    monkeypatch.setattr(main, "openai_client", None)
+    cache = SemanticCache()
+    assert await cache.embed("what is force") is None
+    cache.add(None, {"answer": "force"})
+    assert cache.lookup(None) is None
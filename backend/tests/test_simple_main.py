@@ -0,0 +1,30 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import simple_main
+
+@pytest.fixture
+def client():
+    with TestClient(simple_main.app) as client:
+        yield client
+
+def test_health_does_not_touch_the_store(client, monkeypatch):
+    async def unavailable():
+        raise AssertionError("health check read the store")
+
+    monkeypatch.setattr(simple_main.store, "count_students", unavailable)
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+
+def test_stats_report_counts(client):
+    client.post("/api/students", json={"student_id": "stats-1", "name": "Asha", "grade": 8, "school_id": "sch-1"})
+    stats = client.get("/api/stats").json()
+    assert stats["students_count"] >= 1
+    assert "sessions_count" in stats
+
+@pytest.mark.parametrize("topic", [["fractions", "decimals"], {"name": "fractions"}])
+def test_worksheet_accepts_unhashable_topic(client, topic):
+    response = client.post("/api/worksheets/generate", json={"subject": "math", "topic": topic, "questions": 2})
+    assert response.status_code == 200
+    assert str(topic) in response.json()["title"]
@@ -3,7 +3,8 @@ Database Models for AI Education Agent
 Defines the core data structures for students, curriculum, assessments, and learning analytics
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, JSON, Index, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -11,6 +12,9 @@ import uuid
 
 Base = declarative_base()
 
+# JSONB on PostgreSQL (binary, indexable with GIN for @> containment); plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
 class Student(Base):
     """Student profile with academic history and learning preferences"""
     __tablename__ = "students"
@@ -26,8 +30,8 @@ class Student(Base):
     # Learning profile
     learning_style = Column(String)  # visual, auditory, kinesthetic
     current_level = Column(Float, default=0.0)  # Overall competency level (0-100)
-    strengths = Column(JSON)  # List of strong subjects/topics
-    weaknesses = Column(JSON)  # List of areas needing improvement
+    strengths = Column(JSONDocument)  # List of strong subjects/topics
+    weaknesses = Column(JSONDocument)  # List of areas needing improvement
 
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -43,9 +47,15 @@ class Student(Base):
 class AcademicRecord(Base):
     """Historical academic performance data"""
     __tablename__ = "academic_records"
+    # Hash-partitioned by student on PostgreSQL, so a student's records sit in one partition;
+    # the partition key has to be part of the primary key
+    __table_args__ = (
+        Index("ix_records_student_subject_year", "student_id", "subject", "academic_year"),
+        {"postgresql_partition_by": "HASH (student_id)"},
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    student_id = Column(String, ForeignKey("students.id"), nullable=False)
+    student_id = Column(String, ForeignKey("students.id"), primary_key=True)
     subject = Column(String, nullable=False)
     topic = Column(String)
     grade_level = Column(Integer, nullable=False)
@@ -71,6 +81,18 @@ class AcademicRecord(Base):
     # Relationships
     student = relationship("Student", back_populates="academic_records")
 
+ACADEMIC_RECORD_PARTITIONS = 16
+
+for _remainder in range(ACADEMIC_RECORD_PARTITIONS):
+    event.listen(
+        AcademicRecord.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TABLE academic_records_p{_remainder} PARTITION OF academic_records "
+            f"FOR VALUES WITH (MODULUS {ACADEMIC_RECORD_PARTITIONS}, REMAINDER {_remainder})"
+        ).execute_if(dialect="postgresql")
+    )
+
 class Curriculum(Base):
     """Government curriculum structure and learning objectives"""
     __tablename__ = "curriculum"
@@ -129,6 +151,9 @@ class ContentItem(Base):
 class LearningSession(Base):
     """Individual learning sessions and progress tracking"""
     __tablename__ = "learning_sessions"
+    __table_args__ = (
+        Index("ix_sessions_student_start", "student_id", "start_time"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     student_id = Column(String, ForeignKey("students.id"), nullable=False)
@@ -146,8 +171,8 @@ class LearningSession(Base):
     engagement_score = Column(Float)  # Based on interaction patterns
 
     # Learning data
-    concepts_covered = Column(JSON)
-    mistakes_made = Column(JSON)  # Common errors for analysis
+    concepts_covered = Column(JSONDocument)
+    mistakes_made = Column(JSONDocument)  # Common errors for analysis
     help_requests = Column(Integer, default=0)
 
     # Adaptive learning
@@ -164,6 +189,9 @@ class LearningSession(Base):
 class Assessment(Base):
     """Assessments and quizzes for measuring student progress"""
     __tablename__ = "assessments"
+    __table_args__ = (
+        Index("ix_assessments_student_completed", "student_id", "is_completed"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     student_id = Column(String, ForeignKey("students.id"), nullable=False)
@@ -196,6 +224,9 @@ class Assessment(Base):
 class Worksheet(Base):
     """AI-generated worksheets for practice"""
     __tablename__ = "worksheets"
+    __table_args__ = (
+        Index("ix_worksheets_student_status", "student_id", "completion_status"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     learning_session_id = Column(String, ForeignKey("learning_sessions.id"))
@@ -233,6 +264,10 @@ class Worksheet(Base):
 class DoubtQuery(Base):
     """Student questions and AI responses for doubt clearing"""
     __tablename__ = "doubt_queries"
+    __table_args__ = (
+        Index("ix_doubts_student_created", "student_id", "created_at"),
+        Index("ix_doubts_concept_tags", "concept_tags", postgresql_using="gin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     student_id = Column(String, ForeignKey("students.id"), nullable=False)
@@ -255,7 +290,7 @@ class DoubtQuery(Base):
     resolution_status = Column(String, default="pending")  # pending, resolved, escalated
 
     # Learning analytics
-    concept_tags = Column(JSON)  # Concepts related to the doubt
+    concept_tags = Column(JSONDocument)  # Concepts related to the doubt
     difficulty_level = Column(String)
     common_misconception = Column(Boolean, default=False)
 
@@ -297,6 +332,9 @@ class TeacherProfile(Base):
 class LearningAnalytics(Base):
     """Aggregated analytics and insights"""
     __tablename__ = "learning_analytics"
+    __table_args__ = (
+        Index("ix_analytics_concepts", "concepts_mastered", postgresql_using="gin"),
+    )
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     student_id = Column(String, ForeignKey("students.id"))
@@ -321,7 +359,7 @@ class LearningAnalytics(Base):
     help_seeking_frequency = Column(Integer, default=0)
 
     # Learning outcomes
-    concepts_mastered = Column(JSON)  # List of mastered concepts
+    concepts_mastered = Column(JSONDocument)  # List of mastered concepts
     learning_goals_achieved = Column(JSON)
     areas_for_improvement = Column(JSON)
 
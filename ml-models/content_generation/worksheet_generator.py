@@ -3,12 +3,92 @@ Worksheet Generator - AI Component for Adaptive Content Creation
 Generates personalized worksheets based on student's learning profile and curriculum
 """
 
-import openai
-import json
+import asyncio
+import numpy as np
+import orjson
 import random
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from types import MappingProxyType
 import re
+import uuid
+from openai_client import create_client, without_retries
+from rate_limiting import RateLimiter
+from semantic_cache import SemanticCache
+
+# Static prompt text, identical for every question of a type. It is sent first (as the system
+# message) so OpenAI's automatic prompt caching can reuse the prefix across calls
+QUESTION_SYSTEM_PROMPT = """You are an expert educator creating personalized questions for government school students.
+
+Every question must:
+- Be suitable for government school students
+- Include clear instructions
+- Provide correct answer and explanation
+"""
+
+MCQ_SCHEMA = """
+Format as JSON:
+{
+    "question": "Question text",
+    "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
+    "correct_answer": "A",
+    "explanation": "Why this answer is correct",
+    "distractors_explanation": "Why other options are incorrect"
+}
+"""
+
+SHORT_SCHEMA = """
+Format as JSON:
+{
+    "question": "Question text",
+    "sample_answer": "Expected answer",
+    "key_points": ["point1", "point2", "point3"],
+    "explanation": "Detailed explanation"
+}
+"""
+
+PROBLEM_SCHEMA = """
+Format as JSON:
+{
+    "question": "Problem statement",
+    "solution_steps": ["step1", "step2", "step3"],
+    "final_answer": "Final answer",
+    "explanation": "Step-by-step explanation"
+}
+"""
+
+QUESTION_SCHEMAS = {
+    "multiple_choice": MCQ_SCHEMA,
+    "short_answer": SHORT_SCHEMA,
+    "problem_solving": PROBLEM_SCHEMA
+}
+
+# Complete system message per question type, concatenated once here rather than per call
+STATIC_PREFIX_BY_TYPE = {
+    question_type: QUESTION_SYSTEM_PROMPT + schema
+    for question_type, schema in QUESTION_SCHEMAS.items()
+}
+
+# Personalization line added for each learning style
+STYLE_BY_LEARNING = {
+    "visual": "\n- Include visual elements or diagrams when possible",
+    "kinesthetic": "\n- Include hands-on or practical applications",
+    "auditory": "\n- Include verbal explanations and discussions"
+}
+
+# Longest one question may take, rate-limit wait included, before it falls back to a template
+QUESTION_TIMEOUT_SECONDS = 20
+
+# Jobs with at least this many questions go through the Batch API instead of online requests
+BATCH_QUESTION_THRESHOLD = 1000
+
+# Templates and curriculum standards per WorksheetGenerator class, loaded by the first instance
+# and shared read-only by every later one in the process
+_SHARED_REFERENCE_DATA: Dict[type, Tuple] = {}
+
+def worksheet_to_json(worksheet: Dict) -> bytes:
+    """Serialize a generated worksheet for an HTTP response; NumPy values and int keys are allowed"""
+    return orjson.dumps(worksheet, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
 
 class WorksheetGenerator:
     """
@@ -16,18 +96,29 @@ class WorksheetGenerator:
     based on student's learning profile, difficulty level, and curriculum requirements
     """
 
-    def __init__(self, openai_api_key: str):
-        openai.api_key = openai_api_key
-        self.question_templates = self._load_question_templates()
-        self.curriculum_standards = self._load_curriculum_standards()
-
-    def generate_worksheet(self,
-                          student_profile: Dict,
-                          subject: str,
-                          topic: str,
-                          difficulty_level: int = 3,
-                          num_questions: int = 10,
-                          question_types: List[str] = None) -> Dict:
+    def __init__(self, openai_api_key: str, rate_limiter: Optional[RateLimiter] = None):
+        self.client = create_client(openai_api_key)
+        # For calls through the rate limiter, which does the retrying
+        self._limited_client = without_retries(self.client)
+        # Pass one limiter to every component sharing the same OpenAI account
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Repeated subject/topic/difficulty/slot requests reuse an earlier completion instead of a new call
+        self.response_cache = SemanticCache(self.client, self.rate_limiter)
+        reference_data = _SHARED_REFERENCE_DATA.get(type(self))
+        if reference_data is None:
+            reference_data = _SHARED_REFERENCE_DATA[type(self)] = (
+                MappingProxyType(self._load_question_templates()),
+                MappingProxyType(self._load_curriculum_standards())
+            )
+        self.question_templates, self.curriculum_standards = reference_data
+
+    async def generate_worksheet(self,
+                                student_profile: Dict,
+                                subject: str,
+                                topic: str,
+                                difficulty_level: int = 3,
+                                num_questions: int = 10,
+                                question_types: List[str] = None) -> Dict:
         """
         Generate a personalized worksheet for a student
 
@@ -48,19 +139,33 @@ class WorksheetGenerator:
         # Analyze student profile for personalization
         personalization_config = self._extract_personalization_config(student_profile)
 
+        # Every question's cache lookup matches on the same subject and topic text, so it is
+        # embedded once here rather than once per question
+        cache_vector = await self.response_cache.embed(f"{subject}: {topic}")
+
         # Generate questions based on curriculum and student needs
-        questions = self._generate_questions(
+        questions = await self._generate_questions(
             subject=subject,
             topic=topic,
             difficulty_level=difficulty_level,
             num_questions=num_questions,
             question_types=question_types,
-            personalization_config=personalization_config
+            personalization_config=personalization_config,
+            cache_vector=cache_vector
         )
 
-        # Create worksheet structure
-        worksheet = {
-            "id": f"worksheet_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        return self._build_worksheet(subject, topic, difficulty_level, questions, personalization_config)
+
+    def _build_worksheet(self,
+                         subject: str,
+                         topic: str,
+                         difficulty_level: int,
+                         questions: List[Dict],
+                         personalization_config: Dict) -> Dict:
+        """Worksheet structure around generated questions, shared by the online and batch paths"""
+        return {
+            # Random rather than timestamped, so worksheets generated in the same second don't collide
+            "id": f"worksheet_{uuid.uuid4().hex[:12]}",
             "title": f"{subject} - {topic} Practice Worksheet",
             "subject": subject,
             "topic": topic,
@@ -73,46 +178,177 @@ class WorksheetGenerator:
             "created_at": datetime.utcnow().isoformat()
         }
 
-        return worksheet
+    async def generate_worksheets(self, requests: List[Dict]) -> Dict:
+        """
+        Generate worksheets for many students, e.g. a whole class
 
-    def _generate_questions(self,
-                           subject: str,
-                           topic: str,
-                           difficulty_level: int,
-                           num_questions: int,
-                           question_types: List[str],
-                           personalization_config: Dict) -> List[Dict]:
-        """Generate questions using AI and templates"""
-        questions = []
+        Small jobs are generated online and returned as {"worksheets": [...]}. Jobs of
+        BATCH_QUESTION_THRESHOLD questions or more are submitted to the Batch API, which is
+        cheaper and not bound by the online rate limits, and return {"batch_id": ...} for
+        fetch_results (called with the same requests).
 
-        # Distribute questions across types
-        type_distribution = self._distribute_question_types(question_types, num_questions)
+        Args:
+            requests: generate_worksheet keyword arguments, one dict per worksheet
+        """
+        total_questions = sum(request.get("num_questions", 10) for request in requests)
+        if total_questions >= BATCH_QUESTION_THRESHOLD:
+            return {"batch_id": await self.generate_worksheets_batch(requests)}
 
-        for question_type, count in type_distribution.items():
-            for i in range(count):
-                question = self._generate_single_question(
-                    subject=subject,
-                    topic=topic,
+        worksheets = await asyncio.gather(*(self.generate_worksheet(**request) for request in requests))
+        return {"worksheets": list(worksheets)}
+
+    async def generate_worksheets_batch(self, requests: List[Dict]) -> str:
+        """
+        Submit every question of the requested worksheets as one OpenAI batch job
+
+        Args:
+            requests: generate_worksheet keyword arguments, one dict per worksheet
+
+        Returns:
+            The batch id to pass to fetch_results once the job completes
+        """
+        lines = []
+        for index, request in enumerate(requests):
+            personalization_config, difficulty_level, question_plan = self._batch_plan(request)
+
+            for number, question_type in enumerate(question_plan, 1):
+                static_prefix, prompt = self._create_question_prompt(
+                    subject=request["subject"],
+                    topic=request["topic"],
                     question_type=question_type,
                     difficulty_level=difficulty_level,
-                    personalization_config=personalization_config,
-                    question_number=len(questions) + 1
+                    personalization_config=personalization_config
                 )
-                questions.append(question)
+                lines.append(orjson.dumps({
+                    "custom_id": f"{index}:{number}:{question_type}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._chat_request(static_prefix, prompt)
+                }))
 
-        return questions
+        batch_file = await self.client.files.create(
+            file=("worksheet_batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
 
-    def _generate_single_question(self,
+    async def fetch_results(self, batch_id: str, requests: List[Dict]) -> Dict:
+        """
+        Collect the worksheets of a batch job
+
+        Args:
+            batch_id: The id generate_worksheets_batch returned
+            requests: The same requests that were submitted, in the same order
+
+        Returns:
+            {"status": "completed", "worksheets": [...]} with one worksheet per request, in
+            request order, built as generate_worksheet builds them. Otherwise {"status": ...}
+            with the batch's status: still running ("validating", "in_progress", "finalizing")
+            or finished without results ("failed", "expired", "cancelling", "cancelled").
+        """
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            return {"status": batch.status}
+
+        output = await self.client.files.content(batch.output_file_id)
+        contents: Dict[str, str] = {}
+        for line in output.content.splitlines():
+            if not line:
+                continue
+            result = orjson.loads(line)
+            if not result.get("error") and result["response"]["status_code"] == 200:
+                contents[result["custom_id"]] = result["response"]["body"]["choices"][0]["message"]["content"]
+
+        worksheets = []
+        for index, request in enumerate(requests):
+            subject, topic = request["subject"], request["topic"]
+            personalization_config, difficulty_level, question_plan = self._batch_plan(request)
+            questions = []
+            for number, question_type in enumerate(question_plan, 1):
+                # As online, a question whose request failed or whose reply doesn't parse
+                # is replaced by a template, so the worksheet always comes back complete
+                try:
+                    question_data = self._parse_ai_response(contents[f"{index}:{number}:{question_type}"])
+                except (KeyError, orjson.JSONDecodeError):
+                    question_data = self._generate_from_template(
+                        subject, topic, question_type, difficulty_level
+                    )
+                questions.append(self._add_question_metadata(
+                    question_data, number, subject, topic, question_type, difficulty_level
+                ))
+            worksheets.append(self._build_worksheet(
+                subject, topic, difficulty_level, questions, personalization_config
+            ))
+
+        return {"status": batch.status, "worksheets": worksheets}
+
+    def _batch_plan(self, request: Dict) -> Tuple[Dict, int, List[str]]:
+        """Personalization, difficulty and per-question types of one batch request, with generate_worksheet's defaults"""
+        personalization_config = self._extract_personalization_config(request["student_profile"])
+        question_types = request.get("question_types") or ["multiple_choice", "short_answer", "problem_solving"]
+        type_distribution = self._distribute_question_types(question_types, request.get("num_questions", 10))
+        question_plan = [
+            question_type
+            for question_type, count in type_distribution.items()
+            for _ in range(count)
+        ]
+        return personalization_config, request.get("difficulty_level", 3), question_plan
+
+    async def _generate_questions(self,
                                  subject: str,
                                  topic: str,
-                                 question_type: str,
                                  difficulty_level: int,
+                                 num_questions: int,
+                                 question_types: List[str],
                                  personalization_config: Dict,
-                                 question_number: int) -> Dict:
-        """Generate a single question using AI"""
+                                 cache_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        """Generate questions using AI and templates, requesting all of them concurrently"""
+
+        # Distribute questions across types
+        type_distribution = self._distribute_question_types(question_types, num_questions)
+
+        # Question numbers are fixed up front; results are read back from the tasks in the same order
+        question_plan = [
+            question_type
+            for question_type, count in type_distribution.items()
+            for _ in range(count)
+        ]
+
+        # Each question times out into a template fallback, so no task fails the group and the
+        # worksheet always comes back complete
+        async with asyncio.TaskGroup() as group:
+            tasks = [
+                group.create_task(self._generate_single_question(
+                    subject=subject,
+                    topic=topic,
+                    question_type=question_type,
+                    difficulty_level=difficulty_level,
+                    personalization_config=personalization_config,
+                    question_number=number,
+                    cache_vector=cache_vector
+                ))
+                for number, question_type in enumerate(question_plan, 1)
+            ]
+
+        return [task.result() for task in tasks]
+
+    async def _generate_single_question(self,
+                                       subject: str,
+                                       topic: str,
+                                       question_type: str,
+                                       difficulty_level: int,
+                                       personalization_config: Dict,
+                                       question_number: int,
+                                       cache_vector: Optional[np.ndarray] = None) -> Dict:
+        """Generate a single question using AI; `cache_vector` is the embedding of the subject and topic"""
 
         # Create prompt for AI generation
-        prompt = self._create_question_prompt(
+        static_prefix, prompt = self._create_question_prompt(
             subject=subject,
             topic=topic,
             question_type=question_type,
@@ -120,19 +356,25 @@ class WorksheetGenerator:
             personalization_config=personalization_config
         )
 
-        try:
-            # Use OpenAI to generate question
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert educator creating personalized questions for government school students."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
+        # Only the subject and topic are embedded for fuzzy matching (the template around them is
+        # the same for every prompt); everything else, the question's slot included, must match
+        # exactly, so each question of a worksheet gets its own completion
+        learning_style = personalization_config.get("learning_style", "visual")
+        language_level = personalization_config.get("language_level", "grade_appropriate")
+        cache_text = f"{subject}: {topic}"
+        cache_scope = f"{question_type}|{difficulty_level}|{learning_style}|{language_level}|{question_number}"
 
-            question_data = self._parse_ai_response(response.choices[0].message.content)
+        try:
+            # Use OpenAI to generate question; a straggler is cancelled and replaced by a template
+            async with asyncio.timeout(QUESTION_TIMEOUT_SECONDS):
+                content, vector = await self.response_cache.lookup(cache_text, cache_scope, cache_vector)
+                if content is not None:
+                    question_data = self._parse_ai_response(content)
+                else:
+                    content = await self._complete(static_prefix, prompt)
+                    question_data = self._parse_ai_response(content)
+                    # Cached only once it parses, so a malformed reply is retried next time
+                    self.response_cache.store(cache_text, vector, content, cache_scope)
 
         except Exception as e:
             # Fallback to template-based generation
@@ -140,7 +382,18 @@ class WorksheetGenerator:
                 subject, topic, question_type, difficulty_level
             )
 
-        # Add metadata
+        return self._add_question_metadata(
+            question_data, question_number, subject, topic, question_type, difficulty_level
+        )
+
+    def _add_question_metadata(self,
+                               question_data: Dict,
+                               question_number: int,
+                               subject: str,
+                               topic: str,
+                               question_type: str,
+                               difficulty_level: int) -> Dict:
+        """Add the question's number, subject, topic, type, difficulty and time estimate"""
         question_data.update({
             "id": question_number,
             "subject": subject,
@@ -152,67 +405,54 @@ class WorksheetGenerator:
 
         return question_data
 
+    def _parse_ai_response(self, content: str) -> Dict:
+        """Parse the question JSON out of the model's reply, ignoring any text or code fence around it"""
+        start, end = content.find("{"), content.rfind("}")
+        # orjson parses UTF-8 bytes directly; raises JSONDecodeError when there is no object
+        return orjson.loads(content[start:end + 1].encode())
+
+    async def _complete(self, static_prefix: str, prompt: str) -> str:
+        """Request one question completion under the shared rate limiter"""
+        response = await self.rate_limiter.call(
+            lambda: self._limited_client.chat.completions.create(**self._chat_request(static_prefix, prompt)),
+            tokens=(len(static_prefix) + len(prompt)) // 4 + 500  # rough prompt estimate plus max_tokens
+        )
+        return response.choices[0].message.content
+
+    def _chat_request(self, static_prefix: str, prompt: str) -> Dict:
+        """Chat completion parameters for one question, shared by the online and batch paths"""
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": static_prefix},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 500,
+            "temperature": 0.7
+        }
+
     def _create_question_prompt(self,
                                subject: str,
                                topic: str,
                                question_type: str,
                                difficulty_level: int,
-                               personalization_config: Dict) -> str:
-        """Create AI prompt for question generation"""
+                               personalization_config: Dict) -> Tuple[str, str]:
+        """Create AI prompt for question generation as (static_prefix, dynamic_suffix)"""
 
         learning_style = personalization_config.get("learning_style", "visual")
         language_level = personalization_config.get("language_level", "grade_appropriate")
 
-        base_prompt = f"""
+        # Everything that repeats across calls goes first so the provider's prefix cache can reuse it
+        static_prefix = STATIC_PREFIX_BY_TYPE.get(question_type, QUESTION_SYSTEM_PROMPT)
+
+        # One f-string, personalization included, instead of appending to the prompt piece by piece
+        dynamic_suffix = f"""
         Create a {question_type} question for {subject} on the topic of {topic}.
 
         Requirements:
         - Difficulty level: {difficulty_level}/5 (1=very easy, 5=very challenging)
         - Learning style: {learning_style}
         - Language level: {language_level}
-        - Suitable for government school students
-        - Include clear instructions
-        - Provide correct answer and explanation
-        """
+        {STYLE_BY_LEARNING.get(learning_style, "")}"""
 
-        if question_type == "multiple_choice":
-            base_prompt += """
-            Format as JSON:
-            {
-                "question": "Question text",
-                "options": ["A) option1", "B) option2", "C) option3", "D) option4"],
-                "correct_answer": "A",
-                "explanation": "Why this answer is correct",
-                "distractors_explanation": "Why other options are incorrect"
-            }
-            """
-        elif question_type == "short_answer":
-            base_prompt += """
-            Format as JSON:
-            {
-                "question": "Question text",
-                "sample_answer": "Expected answer",
-                "key_points": ["point1", "point2", "point3"],
-                "explanation": "Detailed explanation"
-            }
-            """
-        elif question_type == "problem_solving":
-            base_prompt += """
-            Format as JSON:
-            {
-                "question": "Problem statement",
-                "solution_steps": ["step1", "step2", "step3"],
-                "final_answer": "Final answer",
-                "explanation": "Step-by-step explanation"
-            }
-            """
-
-        # Add personalization based on learning style
-        if learning_style == "visual":
-            base_prompt += "\n- Include visual elements or diagrams when possible"
-        elif learning_style == "kinesthetic":
-            base_prompt += "\n- Include hands-on or practical applications"
-        elif learning_style == "auditory":
-            base_prompt += "\n- Include verbal explanations and discussions"
-
-        return base_prompt
\ No newline at end of file
+        return static_prefix, dynamic_suffix
\ No newline at end of file
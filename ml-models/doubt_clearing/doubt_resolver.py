@@ -3,14 +3,203 @@ Doubt Resolver - AI Component for Intelligent Tutoring
 Provides personalized doubt clearing and explanations using AI
 """
 
-import openai
+import asyncio
 import json
+import os
 import re
-from typing import Dict, List, Optional, Tuple
+import math
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 from datetime import datetime
+from types import MappingProxyType
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.tokenize import word_tokenize, sent_tokenize
+from nltk.tokenize import NLTKWordTokenizer
+from openai_client import create_client, without_retries
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; fall back to a regex alternation
+    ahocorasick = None
+from rate_limiting import RateLimiter
+from semantic_cache import SemanticCache
+
+# Trigger words per question type, in priority order: the first type with a match wins
+QUESTION_TYPE_KEYWORDS = (
+    ("definition", ("what", "define", "meaning")),
+    ("procedure", ("how", "steps", "process")),
+    ("explanation", ("why", "reason", "because")),
+    ("example_request", ("example", "instance", "show me")),
+    ("problem_solving", ("solve", "calculate", "find")),
+    ("comparison", ("difference", "compare", "versus"))
+)
+QUESTION_TYPE_PRIORITY = {question_type: rank for rank, (question_type, _) in enumerate(QUESTION_TYPE_KEYWORDS)}
+
+# One pass over the question with a named group per type. Keywords match anywhere, as
+# substrings ("show" contains "how"); the lookahead lets matches overlap so no keyword hides
+# another, and at a shared position the higher-priority type is tried first
+QUESTION_TYPE_PATTERN = re.compile("(?=" + "|".join(
+    rf"(?P<{question_type}>{'|'.join(map(re.escape, words))})"
+    for question_type, words in QUESTION_TYPE_KEYWORDS
+) + ")")
+
+STOP_WORDS = frozenset(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'])
+
+# The word tokenizer behind word_tokenize, built once. It needs no NLTK data download; skipping
+# the Punkt sentence split only leaves a period on a word that ends a sentence mid-question
+WORD_TOKENIZER = NLTKWordTokenizer()
+
+# Substring matches ("contest" counts as "test"), overlapping through the lookahead
+URGENCY_PATTERN = re.compile(r"(?=(urgent|exam|test|tomorrow|help|stuck|confused))")
+
+# Questions longer than this are tokenized and sentiment-scored in the analysis process pool, so
+# that pure-Python work neither blocks the event loop nor serializes other requests behind the GIL.
+# Below it the inter-process round trip costs more than the work
+POOLED_ANALYSIS_MIN_CHARS = 500
+
+# Analysis processes per server process; every server worker gets its own pool, so this stays small
+ANALYSIS_POOL_WORKERS = int(os.getenv("ANALYSIS_POOL_WORKERS", "2"))
+
+# Sent first on every call so OpenAI's automatic prompt caching can reuse it
+DOUBT_SYSTEM_PROMPT = """You are a patient tutor clearing doubts for government school students.
+Explain in simple language suited to the student's level, check understanding as you go,
+and encourage the student to keep asking questions."""
+
+# Valences on VADER's -4..4 scale for the words that carry sentiment in student questions
+SENTIMENT_LEXICON = {
+    # frustration and distress
+    "hate": -2.7, "hated": -2.5, "hates": -2.5, "annoying": -1.8, "annoyed": -1.6, "angry": -2.3,
+    "frustrated": -2.4, "frustrating": -2.2, "frustration": -2.1, "upset": -1.6, "sad": -2.1,
+    "worried": -1.8, "worry": -1.9, "scared": -1.9, "afraid": -2.0, "fear": -2.2, "nervous": -1.1,
+    "anxious": -1.0, "stressed": -1.4, "stress": -1.8, "panic": -2.3, "tired": -1.9, "bored": -1.1,
+    "boring": -1.3, "useless": -1.8, "pointless": -1.8, "stupid": -2.4, "dumb": -2.3, "idiot": -2.3,
+    "terrible": -2.1, "horrible": -2.5, "awful": -2.0, "worst": -3.1, "bad": -2.5, "worse": -2.1,
+    "fail": -2.5, "failed": -2.3, "failing": -2.3, "failure": -2.3, "wrong": -2.1, "mistake": -1.4,
+    "mistakes": -1.5, "error": -1.7, "problem": -1.7, "problems": -1.7, "trouble": -1.7,
+    "difficult": -1.5, "hard": -0.4, "impossible": -1.6, "lost": -1.3, "stuck": -1.0,
+    "confused": -1.3, "confusing": -0.9, "confusion": -1.2, "unclear": -1.0, "struggle": -1.3,
+    "struggling": -1.4, "quit": -1.1, "cry": -2.1, "crying": -2.1, "ugh": -1.8,
+    "damn": -1.7, "hopeless": -2.0, "helpless": -2.0, "embarrassed": -1.5, "ashamed": -2.1,
+    "disappointed": -1.9, "disappointing": -2.2, "unfair": -2.1, "hurt": -2.4, "pain": -2.3,
+    "painful": -2.2, "sucks": -1.5, "weird": -0.7, "strange": -0.8, "doubt": -1.5, "doubts": -1.2,
+    "never": -0.5, "no": -1.2, "cannot": -0.9, "unable": -1.5, "forgot": -1.2,
+    "forget": -0.9, "late": -0.6, "urgent": -0.6, "emergency": -1.6, "danger": -2.4, "dangerous": -2.1,
+    # curiosity, interest and gratitude
+    "curious": 1.3, "curiosity": 1.3, "interested": 1.7, "interesting": 1.7, "interest": 2.0,
+    "fascinating": 2.5, "fascinated": 2.3, "amazing": 2.8, "awesome": 3.1, "wow": 2.8, "cool": 1.3,
+    "fun": 2.3, "enjoy": 2.2, "enjoyed": 2.3, "enjoying": 2.4, "love": 3.2, "loved": 2.9, "like": 1.5,
+    "liked": 1.8, "likes": 1.8, "wonder": 1.6, "wondering": 1.0, "wonderful": 2.7, "excited": 1.4,
+    "exciting": 2.2, "eager": 1.5, "happy": 2.7, "glad": 2.0, "great": 3.1, "good": 1.9, "better": 1.9,
+    "best": 3.2, "nice": 1.8, "excellent": 2.7, "perfect": 2.7, "beautiful": 2.9, "brilliant": 2.8,
+    "clear": 1.6, "clearly": 1.7, "easy": 1.9, "easier": 1.8, "simple": 1.2, "understand": 1.1,
+    "understood": 1.2, "learn": 1.8, "learning": 1.6, "learned": 1.5, "explore": 1.3, "discover": 1.4,
+    "please": 1.3, "thanks": 1.9, "thank": 1.5, "thankful": 2.7, "grateful": 2.0, "appreciate": 1.7,
+    "help": 1.7, "helpful": 1.8, "helps": 1.5, "support": 1.7, "hope": 1.9, "hoping": 1.8,
+    "confident": 2.2, "improve": 1.9, "improved": 2.1, "improving": 1.8, "success": 2.7,
+    "successful": 2.8, "pass": 1.0, "passed": 1.6, "solved": 1.1, "correct": 1.3, "right": 1.1,
+    "smart": 1.7, "yes": 1.7, "yay": 2.4, "fine": 0.8, "okay": 0.9, "ok": 1.2, "sure": 1.3,
+    "want": 0.3, "favorite": 2.0, "impressive": 2.3, "inspired": 2.2, "motivated": 1.5
+}
+
+# Words that flip the valence of the next sentiment word (the tokenizer splits "don't" into "do", "n't")
+SENTIMENT_NEGATIONS = frozenset(["not", "n't", "never", "nothing", "nobody", "none", "neither", "nor", "without"])
+
+_vader_analyzer: Optional[SentimentIntensityAnalyzer] = None
+_analysis_pool: Optional[ProcessPoolExecutor] = None
+
+def start_analysis_pool(max_workers: int = ANALYSIS_POOL_WORKERS):
+    """
+    Create the text-analysis process pool shared by every resolver in this process
+
+    Call once per server process at startup (e.g. in the app's lifespan) and pair it with
+    shutdown_analysis_pool. The pool's processes are spawned rather than forked: a server
+    worker already runs threads (event loop, threadpool), and forking a threaded process
+    can copy locks held by other threads into the children. Until the pool is started,
+    long questions are analyzed in a thread instead.
+    """
+    global _analysis_pool
+    if _analysis_pool is None:
+        _analysis_pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+def shutdown_analysis_pool():
+    """Stop the text-analysis processes started by start_analysis_pool"""
+    global _analysis_pool
+    if _analysis_pool is not None:
+        _analysis_pool.shutdown(cancel_futures=True)
+        _analysis_pool = None
+
+def _key_concepts(tokens: List[str]) -> List[str]:
+    """Up to 5 concept words from a tokenized question"""
+
+    # Remove common words and extract potential concepts, stopping once 5 are found
+    concepts = (token for token in (token.rstrip(".") for token in tokens)
+                if token not in STOP_WORDS and len(token) > 3)
+
+    # Subject-specific concept extraction could be enhanced with domain knowledge
+    return list(islice(concepts, 5))  # Return top 5 concepts
+
+def _lexicon_polarity_scores(tokens: List[str]) -> Dict[str, float]:
+    """VADER-shaped neg/neu/pos/compound scores from one pass over SENTIMENT_LEXICON"""
+
+    positive = negative = 0.0
+    neutral_count = 0
+    negate = False
+    for token in tokens:
+        valence = SENTIMENT_LEXICON.get(token)
+        if valence is None:
+            neutral_count += 1
+            negate = negate or token in SENTIMENT_NEGATIONS
+            continue
+        if negate:
+            # Same dampened flip VADER applies after a negation
+            valence *= -0.74
+            negate = False
+        if valence > 0:
+            positive += valence
+        else:
+            negative -= valence
+
+    total = positive - negative
+    # VADER's normalisation of the summed valence into -1..1
+    compound = total / math.sqrt(total * total + 15) if total else 0.0
+
+    weight = positive + negative + neutral_count
+    if not weight:
+        return {"neg": 0.0, "neu": 1.0, "pos": 0.0, "compound": 0.0}
+    return {
+        "neg": round(negative / weight, 3),
+        "neu": round(neutral_count / weight, 3),
+        "pos": round(positive / weight, 3),
+        "compound": round(compound, 4)
+    }
+
+def _polarity_scores(question: str, tokens: List[str], use_vader: bool) -> Dict[str, float]:
+    """Sentiment scores from VADER when enabled, otherwise from the built-in lexicon"""
+    global _vader_analyzer
+    if not use_vader:
+        return _lexicon_polarity_scores(tokens)
+    if _vader_analyzer is None:
+        _vader_analyzer = SentimentIntensityAnalyzer()
+    return _vader_analyzer.polarity_scores(question)
+
+def _analyze_text(question: str,
+                  use_vader: bool,
+                  question_lower: Optional[str] = None) -> Tuple[List[str], Dict[str, float]]:
+    """Tokenize once and derive the key concepts and sentiment scores.
+
+    Module-level so the analysis process pool can run it; tokenization and scoring are
+    batched into one call to pay for a single inter-process round trip.
+    """
+    tokens = WORD_TOKENIZER.tokenize(question_lower if question_lower is not None else question.lower())
+    return _key_concepts(tokens), _polarity_scores(question, tokens, use_vader)
+
+# Reference data per DoubtResolver class, loaded by the first instance and shared read-only by
+# every later one in the process (a subclass may override the loaders, so it gets its own)
+_SHARED_REFERENCE_DATA: Dict[type, Tuple] = {}
 
 class DoubtResolver:
     """
@@ -18,18 +207,45 @@ class DoubtResolver:
     examples, and guidance for student questions
     """
 
-    def __init__(self, openai_api_key: str):
-        openai.api_key = openai_api_key
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
-        self.common_misconceptions = self._load_common_misconceptions()
-        self.explanation_templates = self._load_explanation_templates()
-
-    def resolve_doubt(self,
-                     question: str,
-                     student_profile: Dict,
-                     context: Optional[str] = None,
-                     subject: Optional[str] = None,
-                     topic: Optional[str] = None) -> Dict:
+    def __init__(self,
+                 openai_api_key: str,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 use_vader_sentiment: bool = False):
+        self.client = create_client(openai_api_key)
+        # For calls through the rate limiter, which does the retrying
+        self._limited_client = without_retries(self.client)
+        # Shared with WorksheetGenerator when both use the same OpenAI account
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Repeated and near-duplicate doubts reuse an earlier explanation
+        self.response_cache = SemanticCache(self.client, self.rate_limiter)
+        # VADER needs the vader_lexicon NLTK download; the built-in lexicon covers the
+        # handful of emotions _analyze_sentiment distinguishes
+        self.use_vader_sentiment = use_vader_sentiment
+        reference_data = _SHARED_REFERENCE_DATA.get(type(self))
+        if reference_data is None:
+            reference_data = _SHARED_REFERENCE_DATA[type(self)] = self._load_reference_data()
+        (self.common_misconceptions, self.misconception_matcher,
+         self.misconceptions_by_pattern, self.explanation_templates) = reference_data
+
+    def _load_reference_data(self) -> Tuple:
+        """Load the misconception and template data and build the misconception matcher, frozen for sharing"""
+
+        common_misconceptions = MappingProxyType({
+            misconception: tuple(patterns)
+            for misconception, patterns in self._load_common_misconceptions().items()
+        })
+        misconception_matcher, misconceptions_by_pattern = self._compile_misconceptions(common_misconceptions)
+        explanation_templates = MappingProxyType(self._load_explanation_templates())
+
+        return (common_misconceptions, misconception_matcher,
+                MappingProxyType(misconceptions_by_pattern), explanation_templates)
+
+    async def resolve_doubt(self,
+                           question: str,
+                           student_profile: Dict,
+                           context: Optional[str] = None,
+                           subject: Optional[str] = None,
+                           topic: Optional[str] = None) -> Dict:
         """
         Resolve a student's doubt with personalized explanation
 
@@ -44,26 +260,51 @@ class DoubtResolver:
             Dictionary containing AI response and metadata
         """
 
+        # The last item the stream yields is the finished resolution
+        async for part in self.resolve_doubt_stream(question, student_profile, context, subject, topic):
+            pass
+        return part
+
+    async def resolve_doubt_stream(self,
+                                   question: str,
+                                   student_profile: Dict,
+                                   context: Optional[str] = None,
+                                   subject: Optional[str] = None,
+                                   topic: Optional[str] = None) -> AsyncIterator[Union[str, Dict]]:
+        """
+        Resolve a student's doubt, streaming the explanation as it is generated
+
+        Takes the same arguments as resolve_doubt. Yields pieces of the explanation text as
+        they arrive, then one final dictionary: the complete resolution resolve_doubt returns.
+        If the model stream fails after text was yielded, the error is raised instead of the
+        final dictionary, so a truncated explanation is never returned as a resolution
+        """
+
         # Analyze the question
-        question_analysis = self._analyze_question(question, subject, topic)
+        question_analysis = await self._analyze_question(question, subject, topic)
 
         # Determine response strategy
         response_strategy = self._determine_response_strategy(
             question_analysis, student_profile
         )
 
-        # Generate personalized response
-        ai_response = self._generate_response(
+        # Generate personalized response, passing it on as it streams in
+        response_parts = []
+        async for text in self._generate_response(
             question=question,
             context=context,
+            subject=subject,
             question_analysis=question_analysis,
             student_profile=student_profile,
             response_strategy=response_strategy
-        )
+        ):
+            response_parts.append(text)
+            yield text
+        ai_response = "".join(response_parts)
 
         # Create response structure
         doubt_resolution = {
-            "query_id": f"doubt_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "query_id": f"doubt_{uuid.uuid4().hex[:12]}",
             "question": question,
             "subject": subject,
             "topic": topic,
@@ -78,42 +319,138 @@ class DoubtResolver:
             "created_at": datetime.utcnow().isoformat()
         }
 
-        return doubt_resolution
+        yield doubt_resolution
+
+    async def _generate_response(self,
+                                 question: str,
+                                 context: Optional[str],
+                                 subject: Optional[str],
+                                 question_analysis: Dict,
+                                 student_profile: Dict,
+                                 response_strategy: Dict) -> AsyncIterator[str]:
+        """Generate the explanation for a doubt using AI, yielding text as it streams in"""
+
+        prompt = self._create_response_prompt(
+            question, context, question_analysis, student_profile, response_strategy
+        )
 
-    def _analyze_question(self, question: str, subject: Optional[str], topic: Optional[str]) -> Dict:
+        # Only the question is embedded for fuzzy matching; the subject, context and strategy
+        # that shape the rest of the prompt must match exactly
+        cache_scope = json.dumps([subject, context, response_strategy], sort_keys=True)
+        streamed = []
+        try:
+            cached, vector = await self.response_cache.lookup(question, cache_scope)
+            if cached is not None:
+                yield cached
+                return
+
+            # The rate limiter covers opening the stream; tokens are then read as they arrive
+            stream = await self.rate_limiter.call(
+                lambda: self._limited_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": DOUBT_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=600,
+                    temperature=0.7,
+                    stream=True
+                ),
+                tokens=(len(DOUBT_SYSTEM_PROMPT) + len(prompt)) // 4 + 600  # rough prompt estimate plus max_tokens
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    streamed.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+
+            if streamed:
+                self.response_cache.store(question, vector, "".join(streamed), cache_scope)
+
+        except Exception:
+            # Once part of the explanation has been sent, the cut-off text must not pass for a
+            # complete answer: the error propagates to the caller instead
+            if streamed:
+                raise
+            # Otherwise fall back to a generic nudge so the student still gets an answer
+            yield ("That's a thoughtful question! Let's break it down step by step, "
+                   "starting from what you already know.")
+
+    def _create_response_prompt(self,
+                                question: str,
+                                context: Optional[str],
+                                question_analysis: Dict,
+                                student_profile: Dict,
+                                response_strategy: Dict) -> str:
+        """Create AI prompt for the explanation, from the question analysis and strategy"""
+
+        # Optional instructions are collected and joined once rather than appended one by one
+        instruction_lines = []
+        if context:
+            instruction_lines.append(f"- The student was studying: {context}")
+        if question_analysis.get("misconception_indicators"):
+            instruction_lines.append(f"- Gently correct these misconceptions: {', '.join(question_analysis['misconception_indicators'])}")
+        if response_strategy.get("include_examples"):
+            instruction_lines.append("- Include a worked example")
+        if response_strategy.get("use_analogies"):
+            instruction_lines.append("- Use an everyday analogy")
+        if response_strategy.get("provide_practice"):
+            instruction_lines.append("- End with a short practice task")
+        instructions = "\n".join(instruction_lines)
+
+        return f"""
+        Student question: {question}
+
+        Question type: {question_analysis.get("question_type", "general_inquiry")}
+        Key concepts: {", ".join(question_analysis.get("key_concepts", [])) or "none identified"}
+        Student seems: {question_analysis.get("sentiment", {}).get("emotion", "neutral")}
+        Learning style: {student_profile.get("learning_style", "visual")}
+
+        Response approach: {response_strategy["approach"]}
+        Explanation style: {response_strategy["explanation_style"]}
+        \n{instructions}"""
+
+    async def _analyze_question(self, question: str, subject: Optional[str], topic: Optional[str]) -> Dict:
+        """Analyze the student's question, with the heavy text analysis off the event loop when it is long"""
+
+        text_analysis = None
+        if len(question) > POOLED_ANALYSIS_MIN_CHARS:
+            # The process pool when one was started, otherwise the default thread executor
+            text_analysis = await asyncio.get_running_loop().run_in_executor(
+                _analysis_pool, _analyze_text, question, self.use_vader_sentiment
+            )
+        return self._run_question_analysis(question, subject, topic, text_analysis)
+
+    def _run_question_analysis(self,
+                               question: str,
+                               subject: Optional[str],
+                               topic: Optional[str],
+                               text_analysis: Optional[Tuple[List[str], Dict[str, float]]] = None) -> Dict:
         """Analyze the student's question to understand intent and complexity"""
 
+        # Lower-cased once here and shared by every analyzer that matches keywords
+        question_lower = question.lower()
+        key_concepts, sentiment_scores = text_analysis or _analyze_text(
+            question, self.use_vader_sentiment, question_lower
+        )
+
         analysis = {
-            "question_type": self._classify_question_type(question),
+            "question_type": self._classify_question_type(question_lower),
             "complexity_level": self._assess_complexity(question),
-            "key_concepts": self._extract_key_concepts(question, subject),
-            "sentiment": self._analyze_sentiment(question),
-            "misconception_indicators": self._detect_misconceptions(question),
-            "urgency_level": self._assess_urgency(question)
+            "key_concepts": key_concepts,
+            "sentiment": self._analyze_sentiment(question, sentiment_scores),
+            "misconception_indicators": self._detect_misconceptions(question_lower),
+            "urgency_level": self._assess_urgency(question_lower)
         }
 
         return analysis
 
-    def _classify_question_type(self, question: str) -> str:
-        """Classify the type of question being asked"""
-
-        question_lower = question.lower()
+    def _classify_question_type(self, question_lower: str) -> str:
+        """Classify the type of question being asked, given the lower-cased question"""
 
-        # Question type patterns
-        if any(word in question_lower for word in ["what", "define", "meaning"]):
-            return "definition"
-        elif any(word in question_lower for word in ["how", "steps", "process"]):
-            return "procedure"
-        elif any(word in question_lower for word in ["why", "reason", "because"]):
-            return "explanation"
-        elif any(word in question_lower for word in ["example", "instance", "show me"]):
-            return "example_request"
-        elif any(word in question_lower for word in ["solve", "calculate", "find"]):
-            return "problem_solving"
-        elif any(word in question_lower for word in ["difference", "compare", "versus"]):
-            return "comparison"
-        else:
+        matched_types = {match.lastgroup for match in QUESTION_TYPE_PATTERN.finditer(question_lower)}
+        if not matched_types:
             return "general_inquiry"
+        return min(matched_types, key=QUESTION_TYPE_PRIORITY.__getitem__)
 
     def _assess_complexity(self, question: str) -> str:
         """Assess the complexity level of the question"""
@@ -132,20 +469,13 @@ class DoubtResolver:
     def _extract_key_concepts(self, question: str, subject: Optional[str]) -> List[str]:
         """Extract key concepts from the question"""
 
-        # Tokenize and extract important terms
-        tokens = word_tokenize(question.lower())
-
-        # Remove common words and extract potential concepts
-        stop_words = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'])
-        concepts = [token for token in tokens if token not in stop_words and len(token) > 3]
-
-        # Subject-specific concept extraction could be enhanced with domain knowledge
-        return concepts[:5]  # Return top 5 concepts
+        return _key_concepts(WORD_TOKENIZER.tokenize(question.lower()))
 
-    def _analyze_sentiment(self, question: str) -> Dict:
-        """Analyze the emotional tone of the question"""
+    def _analyze_sentiment(self, question: str, scores: Optional[Dict[str, float]] = None) -> Dict:
+        """Analyze the emotional tone of the question, from precomputed scores when given"""
 
-        scores = self.sentiment_analyzer.polarity_scores(question)
+        if scores is None:
+            scores = _polarity_scores(question, WORD_TOKENIZER.tokenize(question.lower()), self.use_vader_sentiment)
 
         # Determine primary emotion
         if scores['compound'] <= -0.5:
@@ -163,28 +493,53 @@ class DoubtResolver:
             "scores": scores
         }
 
-    def _detect_misconceptions(self, question: str) -> List[str]:
-        """Detect potential misconceptions in the question"""
+    def _detect_misconceptions(self, question_lower: str) -> List[str]:
+        """Detect potential misconceptions in the lower-cased question"""
 
-        misconceptions = []
-        question_lower = question.lower()
+        if self.misconception_matcher is None:
+            return []
+
+        # Single scan for every misconception pattern at once
+        if ahocorasick is not None:
+            matched_patterns = (pattern for _, pattern in self.misconception_matcher.iter(question_lower))
+        else:
+            matched_patterns = (match.group(1) for match in self.misconception_matcher.finditer(question_lower))
+
+        found = set()
+        for pattern in matched_patterns:
+            found.update(self.misconceptions_by_pattern[pattern])
 
-        # Check against common misconception patterns
-        for misconception, patterns in self.common_misconceptions.items():
+        return [misconception for misconception in self.common_misconceptions if misconception in found]
+
+    def _compile_misconceptions(self, common_misconceptions: Dict[str, Tuple[str, ...]]) -> Tuple[Optional[object], Dict[str, List[str]]]:
+        """Build one matcher over every misconception pattern: an Aho-Corasick automaton, or a regex"""
+
+        misconceptions_by_pattern: Dict[str, List[str]] = {}
+        for misconception, patterns in common_misconceptions.items():
             for pattern in patterns:
-                if pattern in question_lower:
-                    misconceptions.append(misconception)
-                    break
+                misconceptions_by_pattern.setdefault(pattern.lower(), []).append(misconception)
 
-        return misconceptions
+        if not misconceptions_by_pattern:
+            return None, misconceptions_by_pattern
 
-    def _assess_urgency(self, question: str) -> str:
-        """Assess the urgency level of the question"""
+        if ahocorasick is not None:
+            # Reports every occurrence of every pattern in one linear pass, overlaps included
+            automaton = ahocorasick.Automaton()
+            for pattern in misconceptions_by_pattern:
+                automaton.add_word(pattern, pattern)
+            automaton.make_automaton()
+            return automaton, misconceptions_by_pattern
 
-        urgent_indicators = ["urgent", "exam", "test", "tomorrow", "help", "stuck", "confused"]
-        question_lower = question.lower()
+        # Longest patterns first so a phrase wins over a pattern it contains; the lookahead lets
+        # matches overlap, like the substring checks this replaces
+        alternation = "|".join(map(re.escape, sorted(misconceptions_by_pattern, key=len, reverse=True)))
+        return re.compile(f"(?=({alternation}))"), misconceptions_by_pattern
+
+    def _assess_urgency(self, question_lower: str) -> str:
+        """Assess the urgency level of the lower-cased question"""
 
-        urgent_count = sum(1 for indicator in urgent_indicators if indicator in question_lower)
+        # Each indicator counts once, however often it appears
+        urgent_count = len(set(URGENCY_PATTERN.findall(question_lower)))
 
         if urgent_count >= 2:
             return "high"
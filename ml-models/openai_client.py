@@ -0,0 +1,29 @@
+"""
+OpenAI Client - Shared async client setup for the AI components
+Every client in a process reuses one pooled HTTP/2 connection pool
+"""
+
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI
+
+@lru_cache(maxsize=None)
+def get_http_client() -> httpx.AsyncClient:
+    """The process-wide HTTP client: keeps TLS connections alive and multiplexes requests over HTTP/2"""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+
+def create_client(api_key: str) -> AsyncOpenAI:
+    """AsyncOpenAI client on the shared connection pool"""
+    return AsyncOpenAI(api_key=api_key, http_client=get_http_client())
+
+def without_retries(client: AsyncOpenAI) -> AsyncOpenAI:
+    """
+    The same client with the SDK's retries off, for calls made through RateLimiter.call: it
+    already retries 429s and timeouts with backoff, and stacking both would multiply the attempts
+    """
+    return client.with_options(max_retries=0)
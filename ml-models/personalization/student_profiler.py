@@ -3,14 +3,350 @@ Student Profiler - AI Component for Personalized Learning
 Analyzes student's academic history and creates personalized learning profiles
 """
 
+import copy
+import math
 import numpy as np
-import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, NamedTuple, Tuple, Optional
 import json
-from datetime import datetime, timedelta
+import hashlib
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import cached_property
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from dateutil import parser as date_parser
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the kernels then run as plain NumPy
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+@njit(cache=True)
+def _closed_form_slope(n: int, sum_y: float, sum_xy: float) -> float:
+    """Least-squares slope of n scores against their index from their sum and index-weighted sum; 0 below 2"""
+    if n < 2:
+        return 0.0
+    sum_x = n * (n - 1) / 2
+    sum_x2 = n * (n - 1) * (2 * n - 1) / 6
+    return (n * sum_xy - sum_x * sum_y) / (n * sum_x2 - sum_x * sum_x)
+
+@njit(cache=True)
+def _slope(scores: np.ndarray) -> float:
+    """Least-squares slope of the scores against their index, in closed form"""
+    return _closed_form_slope(scores.size, scores.sum(), (np.arange(scores.size) * scores).sum())
+
+class _ScoreStats(NamedTuple):
+    """Whole-history score statistics; the slopes and first/last means follow assessment date order"""
+    mean: float
+    std: float
+    min: float
+    max: float
+    slope: float
+    recent_slope: float
+    first_mean: float
+    last_mean: float
+
+@njit(cache=True)
+def _score_stats(scores: np.ndarray) -> Tuple[float, float, float, float, float, float, float, float]:
+    """
+    Everything the profile needs from the date-ordered scores, in one compiled call, as the
+    fields of _ScoreStats: mean and sample std (computed once for every helper), extremes,
+    overall slope, slope of the last 10, and means of the first and last 5
+    """
+    n = scores.size
+    total = scores.sum()
+    squares = (scores * scores).sum()
+    std = np.sqrt(max((squares - total * total / n) / (n - 1), 0.0)) if n > 1 else np.nan
+    return (total / n, std, scores.min(), scores.max(), _slope(scores), _slope(scores[-10:]),
+            scores[:5].mean(), scores[-5:].mean())
+
+# Below this many records the plain-Python statistics beat NumPy's per-call overhead
+_SMALL_HISTORY = 32
+
+def _small_score_stats(scores: List[float]) -> Tuple[float, float, float, float, float, float, float, float]:
+    """_score_stats for short histories, on a list of the date-ordered scores"""
+    n = len(scores)
+    total = sum(scores)
+    squares = sum(score * score for score in scores)
+    std = math.sqrt(max((squares - total * total / n) / (n - 1), 0.0)) if n > 1 else math.nan
+    recent, first, last = scores[-10:], scores[:5], scores[-5:]
+    return (total / n, std, min(scores), max(scores),
+            _closed_form_slope(n, total, sum(i * score for i, score in enumerate(scores))),
+            _closed_form_slope(len(recent), sum(recent), sum(i * score for i, score in enumerate(recent))),
+            sum(first) / len(first), sum(last) / len(last))
+
+def _group_stats(codes: np.ndarray, scores: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Count and sum of the scores for each of `size` integer group codes, without sorting"""
+    counts = np.bincount(codes, minlength=size)
+    sums = np.bincount(codes, weights=scores, minlength=size)
+    return counts, sums
+
+def _sample_std(count, total, squares):
+    """Sample standard deviation (ddof=1) from count, sum and sum of squares; NaN below 2 values"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (squares - total * total / count) / (count - 1)
+    return np.sqrt(np.maximum(variance, 0))
+
+@dataclass
+class _Agg:
+    """Per-subject and per-difficulty score statistics, computed once and shared by the analysis helpers"""
+    subjects: np.ndarray
+    subject_mean: np.ndarray
+    subject_count: np.ndarray
+    difficulty_levels: Optional[np.ndarray]
+    difficulty_mean: Optional[np.ndarray]
+
+@dataclass
+class _Categories:
+    """Integer-coded column: `codes` index into the sorted distinct `values`, -1 where a record has none"""
+    values: np.ndarray
+    codes: np.ndarray
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, index: Dict) -> "_Categories":
+        """Renumber codes given in first-seen order (`index` maps value to code) to sorted value order"""
+        values = np.array(list(index), dtype=object)
+        order = np.argsort(values, kind="stable")
+        rank = np.empty(len(values) + 1, dtype=np.intp)
+        rank[order] = np.arange(len(values))
+        rank[-1] = -1
+        return cls(values=values[order], codes=rank[codes])
+
+@dataclass
+class _ArrayView:
+    """Academic records as one NumPy array per field; optional fields are None when no record has them"""
+    score: np.ndarray
+    subject: _Categories
+    assessment_date: np.ndarray
+    topic: Optional[_Categories] = None
+    difficulty_level: Optional[_Categories] = None
+    assessment_type: Optional[_Categories] = None
+    time_taken_minutes: Optional[np.ndarray] = None
+    attempts: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+_CATEGORY_FIELDS = ("subject", "topic", "difficulty_level", "assessment_type")
+_NUMERIC_FIELDS = ("time_taken_minutes", "attempts")
+
+def _parse_date(value) -> np.datetime64:
+    """
+    An assessment date as naive UTC datetime64[ns], accepting what pd.to_datetime did: ISO
+    strings (offsets are converted to UTC), loose forms like "2024-1-5" or "15/01/2024" and
+    date/datetime objects
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                value = date_parser.parse(value)
+            except (ValueError, OverflowError):
+                raise ValueError(f"Unrecognized assessment_date: {value!r}") from None
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    return np.datetime64(value, "ns")
+
+def _to_arrays(academic_records: List[Dict]) -> _ArrayView:
+    """Per-field arrays of the records in assessment date order; missing values are -1 codes or NaN"""
+    count = len(academic_records)
+    scores = np.empty(count, dtype=np.float64)
+    dates = np.empty(count, dtype="datetime64[ns]")
+    # Students often have several assessments on one day, so each distinct date is parsed once
+    parsed_dates = {}
+    # Category fields hold (codes, value -> code) pairs, coded in first-seen order
+    categories = {}
+    numeric = {}
+
+    for i, record in enumerate(academic_records):
+        scores[i] = record["score"]
+        raw_date = record["assessment_date"]
+        if raw_date not in parsed_dates:
+            parsed_dates[raw_date] = _parse_date(raw_date)
+        dates[i] = parsed_dates[raw_date]
+        for field in _CATEGORY_FIELDS:
+            if field in record:
+                if field not in categories:
+                    categories[field] = (np.full(count, -1, dtype=np.intp), {})
+                value = record[field]
+                if value is not None:
+                    codes, index = categories[field]
+                    codes[i] = index.setdefault(value, len(index))
+        for field in _NUMERIC_FIELDS:
+            if field in record:
+                if field not in numeric:
+                    numeric[field] = np.full(count, np.nan)
+                if record[field] is not None:
+                    numeric[field][i] = record[field]
+
+    # Sorted once here so every helper can read date order straight off the arrays;
+    # records from the same date keep their input order
+    order = np.argsort(dates, kind="stable")
+    return _ArrayView(
+        score=scores[order],
+        assessment_date=dates[order],
+        **{field: _Categories.from_codes(codes[order], index) for field, (codes, index) in categories.items()},
+        **{field: column[order] for field, column in numeric.items()}
+    )
+
+def _nan_mean(values: np.ndarray) -> float:
+    """Mean of the non-NaN values, NaN if there are none"""
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if len(values) else float("nan")
+
+def _aggregate(view: _ArrayView) -> _Agg:
+    """Per-subject and per-difficulty statistics from the record arrays"""
+    scores = view.score
+    # Records without a subject are left out of the per-subject groups, as with difficulty below
+    subjects = view.subject
+    tagged = subjects.codes >= 0
+    counts, sums = _group_stats(subjects.codes[tagged], scores[tagged], len(subjects.values))
+
+    difficulty_levels = difficulty_mean = None
+    if view.difficulty_level is not None:
+        # Records without a difficulty level are left out, as a groupby drops missing keys
+        levels = view.difficulty_level
+        rated = levels.codes >= 0
+        level_counts, level_sums = _group_stats(levels.codes[rated], scores[rated], len(levels.values))
+        difficulty_levels, difficulty_mean = levels.values, level_sums / level_counts
+
+    return _Agg(
+        subjects=view.subject.values,
+        subject_mean=sums / counts,
+        subject_count=counts,
+        difficulty_levels=difficulty_levels,
+        difficulty_mean=difficulty_mean
+    )
+
+# Learning-style heuristic: each style's score is a weighted sum of the interaction counts
+LEARNING_STYLES = ("visual", "auditory", "kinesthetic")
+_INTERACTION_KEYS = ("image_interactions", "diagram_time", "audio_interactions",
+                     "explanation_requests", "interactive_exercises", "hands_on_activities")
+_STYLE_WEIGHTS = np.array([
+    [1, 0.1, 0, 0, 0, 0],
+    [0, 0, 1, 0.5, 0, 0],
+    [0, 0, 0, 0, 1, 0.3]
+])
+
+# Recommended level by recent score band (5 points wide, 0-100) for steady and improving students;
+# every threshold of the level rules falls on a band edge
+_LEVEL_BY_BAND = np.array([
+    [1] * 14 + [2] * 5 + [3] * 2,
+    [1] * 14 + [2] * 3 + [3] + [4] * 2 + [5]
+])
+
+# Personalization settings, built once; the helpers hand out shallow copies
+DEFAULT_CONTENT_PREFERENCES = {
+    "explanation_style": "detailed",
+    "example_types": ("practical", "visual"),
+    "interaction_level": "medium"
+}
+CONTENT_PREFERENCES_BY_STYLE = {
+    "visual": {**DEFAULT_CONTENT_PREFERENCES, "example_types": ("visual", "diagrams", "charts")},
+    "auditory": {**DEFAULT_CONTENT_PREFERENCES, "example_types": ("verbal", "audio", "discussions")},
+    "kinesthetic": {**DEFAULT_CONTENT_PREFERENCES, "example_types": ("hands-on", "interactive", "practical")}
+}
+PACING_BY_PACE = {
+    "fast": {"pace": "fast", "session_length": 15, "break_frequency": 10},
+    "medium": {"pace": "medium", "session_length": 30, "break_frequency": 15},
+    "slow": {"pace": "slow", "session_length": 60, "break_frequency": 20}
+}
+MOTIVATION_BY_TREND = {
+    "declining": {"strategy": "encouragement", "focus": "small_wins", "rewards": "frequent"},
+    "improving": {"strategy": "challenge", "focus": "growth", "rewards": "achievement_based"},
+    "stable": {"strategy": "balanced", "focus": "consistency", "rewards": "progress_based"}
+}
+
+class Profile(Mapping):
+    """
+    Analysis of one student's academic history, read like a dict. Each section and the
+    statistics behind it are computed on first access and kept, so callers that only read
+    a few sections (e.g. generate_personalization_config) never pay for the others.
+    Profiles are shared through the profiler's cache, so reads return copies of the sections
+    """
+
+    SECTIONS = ("overall_performance", "subject_strengths", "learning_trends", "difficulty_preferences",
+                "recommended_level", "learning_gaps", "study_patterns")
+
+    def __init__(self, profiler: "StudentProfiler", view: _ArrayView):
+        self._profiler = profiler
+        self._view = view
+
+    def __getitem__(self, key: str):
+        if key not in self.SECTIONS:
+            raise KeyError(key)
+        # A copy, so a caller editing its result cannot change what the next request is served
+        return copy.deepcopy(getattr(self, key))
+
+    def __contains__(self, key) -> bool:
+        # Mapping's default would compute the section just to test for it
+        return key in self.SECTIONS
+
+    def __iter__(self):
+        return iter(self.SECTIONS)
+
+    def __len__(self) -> int:
+        return len(self.SECTIONS)
+
+    def to_dict(self) -> Dict:
+        """Every section as a plain dict, e.g. for JSON serialization"""
+        return {key: self[key] for key in self.SECTIONS}
+
+    # Shared statistics
+    @cached_property
+    def _agg(self) -> _Agg:
+        # Per-subject and per-difficulty statistics in one pass instead of a groupby per helper
+        return _aggregate(self._view)
+
+    @cached_property
+    def _stats(self) -> _ScoreStats:
+        if len(self._view) < _SMALL_HISTORY:
+            return _ScoreStats(*_small_score_stats(self._view.score.tolist()))
+        return _ScoreStats(*(float(value) for value in _score_stats(self._view.score)))
+
+    @cached_property
+    def _recent_performance(self) -> float:
+        return self._stats.last_mean if len(self._view) >= 5 else self._stats.mean
+
+    @cached_property
+    def _improvement_rate(self) -> float:
+        return self._profiler._calculate_improvement_rate(
+            len(self._view), self._stats.first_mean, self._stats.last_mean
+        )
+
+    # Sections
+    @cached_property
+    def overall_performance(self) -> Dict:
+        return self._profiler._calculate_overall_performance(
+            self._stats, self._recent_performance, self._improvement_rate
+        )
+
+    @cached_property
+    def subject_strengths(self) -> Dict:
+        return self._profiler._identify_subject_strengths(self._agg)
+
+    @cached_property
+    def learning_trends(self) -> Dict:
+        return self._profiler._analyze_learning_trends(self._stats)
+
+    @cached_property
+    def difficulty_preferences(self) -> Dict:
+        return self._profiler._assess_difficulty_preferences(self._view, self._agg)
+
+    @cached_property
+    def recommended_level(self) -> int:
+        return self._profiler._recommend_difficulty_level(self._recent_performance, self._improvement_rate)
+
+    @cached_property
+    def learning_gaps(self) -> List[Dict]:
+        return self._profiler._identify_learning_gaps(self._view, self._agg)
+
+    @cached_property
+    def study_patterns(self) -> Dict:
+        return self._profiler._analyze_study_patterns(self._view)
 
 class StudentProfiler:
     """
@@ -18,13 +354,24 @@ class StudentProfiler:
     to create personalized learning recommendations
     """
 
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.pca = PCA(n_components=5)
+    def __init__(self, max_cached_profiles: int = 128):
+        # sklearn is only imported once a model actually needs it
+        self.scaler = None
+        self.pca = None
         self.learning_style_classifier = None
         self.difficulty_predictor = None
-
-    def analyze_academic_history(self, academic_records: List[Dict]) -> Dict:
+        self.max_cached_profiles = max_cached_profiles
+        # Analyses by records hash, least recently used first
+        self._profile_cache: "OrderedDict[bytes, Profile]" = OrderedDict()
+
+    def _get_scaler(self):
+        """Feature scaler, created (and sklearn imported) on first use"""
+        if self.scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self.scaler = StandardScaler()
+        return self.scaler
+
+    def analyze_academic_history(self, academic_records: List[Dict]) -> Mapping:
         """
         Analyze student's academic performance history to identify patterns
 
@@ -32,147 +379,140 @@ class StudentProfiler:
             academic_records: List of academic performance records
 
         Returns:
-            Dict containing analysis results and insights
+            Read-only mapping of analysis results and insights; each section is computed
+            when first read (use Profile.to_dict() for a plain dict of every section)
         """
         if not academic_records:
             return self._default_profile()
 
-        df = pd.DataFrame(academic_records)
-
-        # Calculate performance metrics
-        overall_performance = self._calculate_overall_performance(df)
-        subject_strengths = self._identify_subject_strengths(df)
-        learning_trends = self._analyze_learning_trends(df)
-        difficulty_preferences = self._assess_difficulty_preferences(df)
-
-        return {
-            "overall_performance": overall_performance,
-            "subject_strengths": subject_strengths,
-            "learning_trends": learning_trends,
-            "difficulty_preferences": difficulty_preferences,
-            "recommended_level": self._recommend_difficulty_level(df),
-            "learning_gaps": self._identify_learning_gaps(df),
-            "study_patterns": self._analyze_study_patterns(df)
-        }
-
-    def _calculate_overall_performance(self, df: pd.DataFrame) -> Dict:
+        # The analysis depends only on the records, so repeat requests reuse the cached result
+        key = hashlib.blake2b(
+            json.dumps(academic_records, sort_keys=True, default=str).encode(), digest_size=16
+        ).digest()
+        if key in self._profile_cache:
+            self._profile_cache.move_to_end(key)
+            return self._profile_cache[key]
+
+        analysis = Profile(self, _to_arrays(academic_records))
+        if len(self._profile_cache) >= self.max_cached_profiles:
+            self._profile_cache.popitem(last=False)
+        self._profile_cache[key] = analysis
+        return analysis
+
+    def _calculate_overall_performance(self, stats: _ScoreStats, recent_performance: float,
+                                       improvement_rate: float) -> Dict:
         """Calculate overall academic performance metrics"""
         return {
-            "average_score": float(df['score'].mean()),
-            "score_std": float(df['score'].std()),
-            "improvement_rate": self._calculate_improvement_rate(df),
-            "consistency_score": self._calculate_consistency(df),
-            "recent_performance": float(df.tail(5)['score'].mean()) if len(df) >= 5 else float(df['score'].mean())
+            "average_score": stats.mean,
+            "score_std": stats.std,
+            "improvement_rate": improvement_rate,
+            "consistency_score": self._calculate_consistency(stats.std),
+            "recent_performance": recent_performance
         }
 
-    def _identify_subject_strengths(self, df: pd.DataFrame) -> Dict:
+    def _identify_subject_strengths(self, agg: _Agg) -> Dict:
         """Identify subjects where student performs well"""
-        subject_performance = df.groupby('subject')['score'].agg(['mean', 'count', 'std']).reset_index()
-        subject_performance['weighted_score'] = (
-            subject_performance['mean'] * np.log(subject_performance['count'] + 1)
-        )
+        weighted_score = agg.subject_mean * np.log1p(agg.subject_count)
 
         # Sort by weighted performance
-        subject_performance = subject_performance.sort_values('weighted_score', ascending=False)
+        order = np.argsort(-weighted_score, kind="stable")
 
-        strengths = subject_performance.head(3)['subject'].tolist()
-        weaknesses = subject_performance.tail(2)['subject'].tolist()
+        strengths = agg.subjects[order[:3]].tolist()
+        weaknesses = agg.subjects[order[-2:]].tolist()
 
         return {
             "strengths": strengths,
             "weaknesses": weaknesses,
-            "subject_scores": subject_performance[['subject', 'mean']].to_dict('records')
+            # Parallel lists rather than a dict per subject, best weighted score first
+            "subject_scores": {
+                "subjects": agg.subjects[order].tolist(),
+                "means": agg.subject_mean[order].tolist()
+            }
         }
 
-    def _analyze_learning_trends(self, df: pd.DataFrame) -> Dict:
+    def _analyze_learning_trends(self, stats: _ScoreStats) -> Dict:
         """Analyze learning trends over time"""
-        df['assessment_date'] = pd.to_datetime(df['assessment_date'])
-        df = df.sort_values('assessment_date')
-
-        # Calculate rolling averages
-        df['rolling_avg'] = df['score'].rolling(window=5, min_periods=1).mean()
-
-        # Trend analysis
-        recent_trend = self._calculate_trend(df.tail(10)['score'].values)
-        overall_trend = self._calculate_trend(df['score'].values)
+        # Trend analysis, from the slopes of the date-ordered scores
+        recent_trend = self._calculate_trend(stats.recent_slope)
+        overall_trend = self._calculate_trend(stats.slope)
 
         return {
             "recent_trend": recent_trend,
             "overall_trend": overall_trend,
-            "volatility": float(df['score'].std()),
-            "peak_performance": float(df['score'].max()),
-            "lowest_performance": float(df['score'].min())
+            "volatility": stats.std,
+            "peak_performance": stats.max,
+            "lowest_performance": stats.min
         }
 
-    def _assess_difficulty_preferences(self, df: pd.DataFrame) -> Dict:
+    def _assess_difficulty_preferences(self, view: _ArrayView, agg: _Agg) -> Dict:
         """Assess student's performance across different difficulty levels"""
-        if 'difficulty_level' not in df.columns:
+        if agg.difficulty_levels is None:
             return {"optimal_difficulty": "medium", "difficulty_scores": {}}
 
-        difficulty_performance = df.groupby('difficulty_level')['score'].mean()
-
         # Find optimal difficulty (best performance with reasonable challenge)
-        optimal_difficulty = self._find_optimal_difficulty(difficulty_performance)
+        optimal_difficulty = self._find_optimal_difficulty(agg.difficulty_levels, agg.difficulty_mean)
 
         return {
             "optimal_difficulty": optimal_difficulty,
-            "difficulty_scores": difficulty_performance.to_dict(),
-            "challenge_tolerance": self._calculate_challenge_tolerance(df)
+            "difficulty_scores": dict(zip(agg.difficulty_levels.tolist(), agg.difficulty_mean.tolist())),
+            "challenge_tolerance": self._calculate_challenge_tolerance(view)
         }
 
-    def _recommend_difficulty_level(self, df: pd.DataFrame) -> int:
+    def _recommend_difficulty_level(self, recent_performance: float, improvement_rate: float) -> int:
         """Recommend appropriate difficulty level (1-5 scale)"""
-        avg_score = df['score'].mean()
-        recent_performance = df.tail(5)['score'].mean() if len(df) >= 5 else avg_score
-        improvement_rate = self._calculate_improvement_rate(df)
-
         # Base difficulty on performance and improvement
-        if recent_performance >= 85 and improvement_rate > 0:
-            return min(5, int((recent_performance - 60) / 10) + 1)
-        elif recent_performance >= 70:
-            return max(2, int((recent_performance - 50) / 15))
-        else:
-            return 1
+        band = min(max(int(recent_performance // 5), 0), _LEVEL_BY_BAND.shape[1] - 1)
+        return int(_LEVEL_BY_BAND[int(improvement_rate > 0), band])
 
-    def _identify_learning_gaps(self, df: pd.DataFrame) -> List[Dict]:
+    def _identify_learning_gaps(self, view: _ArrayView, agg: _Agg) -> List[Dict]:
         """Identify specific learning gaps and areas for improvement"""
         gaps = []
-
-        # Subject-wise gaps
-        subject_performance = df.groupby('subject')['score'].mean()
-        weak_subjects = subject_performance[subject_performance < 70].index.tolist()
-
-        for subject in weak_subjects:
-            subject_data = df[df['subject'] == subject]
-            if 'topic' in subject_data.columns:
-                weak_topics = subject_data.groupby('topic')['score'].mean()
-                weak_topics = weak_topics[weak_topics < 65].index.tolist()
-
-                gaps.append({
-                    "subject": subject,
-                    "weak_topics": weak_topics,
-                    "average_score": float(subject_performance[subject]),
-                    "priority": "high" if subject_performance[subject] < 60 else "medium"
-                })
+        if view.topic is None:
+            return gaps
+        topics = view.topic.values
+        has_topic = (view.topic.codes >= 0) & (view.subject.codes >= 0)
+
+        # Per-(subject, topic) means in one grouped pass, keyed by subject code * topic count + topic code
+        # so the groups come out in subject then topic order; pairs no record has stay out
+        pair_codes = view.subject.codes[has_topic] * len(topics) + view.topic.codes[has_topic]
+        counts, sums = _group_stats(pair_codes, view.score[has_topic], len(agg.subjects) * len(topics))
+        observed = np.flatnonzero(counts)
+        weak_pairs = observed[sums[observed] / counts[observed] < 65]
+        weak_pair_subjects = weak_pairs // max(len(topics), 1)
+
+        # Subject-wise gaps, from the shared per-subject means
+        for code in np.flatnonzero(agg.subject_mean < 70).tolist():
+            start, end = np.searchsorted(weak_pair_subjects, [code, code + 1])
+            average_score = float(agg.subject_mean[code])
+
+            gaps.append({
+                "subject": agg.subjects[code],
+                "weak_topics": topics[weak_pairs[start:end] % len(topics)].tolist(),
+                "average_score": average_score,
+                "priority": "high" if average_score < 60 else "medium"
+            })
 
         return gaps
 
-    def _analyze_study_patterns(self, df: pd.DataFrame) -> Dict:
+    def _analyze_study_patterns(self, view: _ArrayView) -> Dict:
         """Analyze study patterns and learning behavior"""
         patterns = {}
 
-        if 'time_taken_minutes' in df.columns:
-            patterns['average_study_time'] = float(df['time_taken_minutes'].mean())
-            patterns['study_time_consistency'] = float(df['time_taken_minutes'].std())
+        if view.time_taken_minutes is not None:
+            times = view.time_taken_minutes[~np.isnan(view.time_taken_minutes)]
+            patterns['average_study_time'] = _nan_mean(view.time_taken_minutes)
+            patterns['study_time_consistency'] = float(_sample_std(len(times), times.sum(), np.dot(times, times)))
 
-        if 'attempts' in df.columns:
-            patterns['average_attempts'] = float(df['attempts'].mean())
-            patterns['persistence_score'] = self._calculate_persistence_score(df)
+        if view.attempts is not None:
+            patterns['average_attempts'] = _nan_mean(view.attempts)
+            patterns['persistence_score'] = self._calculate_persistence_score(view)
 
         # Performance by assessment type
-        if 'assessment_type' in df.columns:
-            type_performance = df.groupby('assessment_type')['score'].mean()
-            patterns['assessment_type_preferences'] = type_performance.to_dict()
+        if view.assessment_type is not None:
+            types = view.assessment_type
+            typed = types.codes >= 0
+            counts, sums = _group_stats(types.codes[typed], view.score[typed], len(types.values))
+            patterns['assessment_type_preferences'] = dict(zip(types.values.tolist(), (sums / counts).tolist()))
 
         return patterns
 
@@ -186,23 +526,39 @@ class StudentProfiler:
         Returns:
             Predicted learning style: 'visual', 'auditory', or 'kinesthetic'
         """
-        # Simple heuristic-based prediction (can be replaced with ML model)
-        visual_score = interaction_data.get('image_interactions', 0) + \
-                      interaction_data.get('diagram_time', 0) * 0.1
+        # Simple heuristic-based prediction (can be replaced with ML model); the same weights as
+        # _STYLE_WEIGHTS, written out since plain float compares beat NumPy for one student
+        get = interaction_data.get
+        best, best_score = 'visual', get('image_interactions', 0) + get('diagram_time', 0) * 0.1
 
-        auditory_score = interaction_data.get('audio_interactions', 0) + \
-                        interaction_data.get('explanation_requests', 0) * 0.5
+        auditory_score = get('audio_interactions', 0) + get('explanation_requests', 0) * 0.5
+        if auditory_score > best_score:
+            best, best_score = 'auditory', auditory_score
 
-        kinesthetic_score = interaction_data.get('interactive_exercises', 0) + \
-                           interaction_data.get('hands_on_activities', 0) * 0.3
+        # Ties go to the earlier style
+        kinesthetic_score = get('interactive_exercises', 0) + get('hands_on_activities', 0) * 0.3
+        if kinesthetic_score > best_score:
+            best = 'kinesthetic'
 
-        scores = {
-            'visual': visual_score,
-            'auditory': auditory_score,
-            'kinesthetic': kinesthetic_score
-        }
+        return best
+
+    def predict_learning_style_many(self, interactions: List[Dict]) -> List[str]:
+        """
+        Predict learning styles for many students at once
 
-        return max(scores, key=scores.get)
+        Args:
+            interactions: One interaction-metrics dictionary per student
+
+        Returns:
+            Predicted learning style per student, in input order
+        """
+        features = np.array(
+            [[interaction_data.get(key, 0) for key in _INTERACTION_KEYS] for interaction_data in interactions],
+            dtype=np.float64
+        ).reshape(len(interactions), len(_INTERACTION_KEYS))
+
+        # One (N, 6) x (6, 3) product scores every student
+        return [LEARNING_STYLES[i] for i in (features @ _STYLE_WEIGHTS.T).argmax(axis=1).tolist()]
 
     def generate_personalization_config(self, student_profile: Dict) -> Dict:
         """
@@ -238,31 +594,19 @@ class StudentProfiler:
             "study_patterns": {}
         }
 
-    def _calculate_improvement_rate(self, df: pd.DataFrame) -> float:
-        """Calculate rate of improvement over time"""
-        if len(df) < 2:
+    def _calculate_improvement_rate(self, count: int, older_scores: float, recent_scores: float) -> float:
+        """Calculate rate of improvement over time from the first and last five scores' means"""
+        if count < 2:
             return 0.0
 
-        df_sorted = df.sort_values('assessment_date')
-        recent_scores = df_sorted.tail(5)['score'].mean()
-        older_scores = df_sorted.head(5)['score'].mean()
-
         return float((recent_scores - older_scores) / max(older_scores, 1))
 
-    def _calculate_consistency(self, df: pd.DataFrame) -> float:
+    def _calculate_consistency(self, std: float) -> float:
         """Calculate consistency score (lower std = higher consistency)"""
-        std_score = df['score'].std()
-        return float(max(0, 100 - std_score))
-
-    def _calculate_trend(self, scores: np.ndarray) -> str:
-        """Calculate trend direction from scores"""
-        if len(scores) < 2:
-            return "stable"
-
-        # Simple linear regression slope
-        x = np.arange(len(scores))
-        slope = np.polyfit(x, scores, 1)[0]
+        return float(max(0, 100 - std))
 
+    def _calculate_trend(self, slope: float) -> str:
+        """Calculate trend direction from the linear regression slope of the scores"""
         if slope > 2:
             return "improving"
         elif slope < -2:
@@ -270,59 +614,49 @@ class StudentProfiler:
         else:
             return "stable"
 
-    def _find_optimal_difficulty(self, difficulty_performance: pd.Series) -> str:
+    def _find_optimal_difficulty(self, levels: np.ndarray, means: np.ndarray) -> str:
         """Find optimal difficulty level based on performance"""
-        if difficulty_performance.empty:
+        if not len(levels):
             return "medium"
 
         # Find difficulty with best performance above 70%
-        good_performance = difficulty_performance[difficulty_performance >= 70]
-        if not good_performance.empty:
-            return good_performance.idxmax()
+        good = means >= 70
+        if good.any():
+            return levels[good][means[good].argmax()]
 
         # Otherwise, return difficulty with best performance
-        return difficulty_performance.idxmax()
+        return levels[means.argmax()]
 
-    def _calculate_challenge_tolerance(self, df: pd.DataFrame) -> float:
+    def _calculate_challenge_tolerance(self, view: _ArrayView) -> float:
         """Calculate how well student handles challenging content"""
-        if 'difficulty_level' not in df.columns:
+        if view.difficulty_level is None:
             return 0.5
 
-        hard_problems = df[df['difficulty_level'].isin(['hard', 'very_hard'])]
-        if hard_problems.empty:
+        levels = view.difficulty_level
+        # Hard or not per level code; the trailing False is what a missing level's -1 code picks
+        is_hard = np.array([level in ('hard', 'very_hard') for level in levels.values.tolist()] + [False])
+        hard_problems = is_hard[levels.codes]
+        if not hard_problems.any():
             return 0.5
 
-        return float(hard_problems['score'].mean() / 100)
+        return float(view.score[hard_problems].mean() / 100)
 
-    def _calculate_persistence_score(self, df: pd.DataFrame) -> float:
+    def _calculate_persistence_score(self, view: _ArrayView) -> float:
         """Calculate persistence based on attempts and completion"""
-        if 'attempts' not in df.columns:
+        if view.attempts is None:
             return 0.5
 
-        avg_attempts = df['attempts'].mean()
+        avg_attempts = _nan_mean(view.attempts)
         # Higher attempts with eventual success indicates persistence
-        successful_attempts = df[df['score'] >= 60]['attempts'].mean()
+        successful_attempts = _nan_mean(view.attempts[view.score >= 60])
 
         return float(min(1.0, successful_attempts / max(avg_attempts, 1)))
 
     def _determine_content_preferences(self, profile: Dict) -> Dict:
         """Determine content preferences based on profile"""
-        preferences = {
-            "explanation_style": "detailed",
-            "example_types": ["practical", "visual"],
-            "interaction_level": "medium"
-        }
-
         # Adjust based on learning style
         learning_style = profile.get("learning_style", "visual")
-        if learning_style == "visual":
-            preferences["example_types"] = ["visual", "diagrams", "charts"]
-        elif learning_style == "auditory":
-            preferences["example_types"] = ["verbal", "audio", "discussions"]
-        elif learning_style == "kinesthetic":
-            preferences["example_types"] = ["hands-on", "interactive", "practical"]
-
-        return preferences
+        return dict(CONTENT_PREFERENCES_BY_STYLE.get(learning_style, DEFAULT_CONTENT_PREFERENCES))
 
     def _determine_optimal_pacing(self, profile: Dict) -> Dict:
         """Determine optimal learning pace"""
@@ -330,11 +664,11 @@ class StudentProfiler:
         avg_study_time = study_patterns.get("average_study_time", 30)
 
         if avg_study_time < 20:
-            return {"pace": "fast", "session_length": 15, "break_frequency": 10}
+            return dict(PACING_BY_PACE["fast"])
         elif avg_study_time > 45:
-            return {"pace": "slow", "session_length": 60, "break_frequency": 20}
+            return dict(PACING_BY_PACE["slow"])
         else:
-            return {"pace": "medium", "session_length": 30, "break_frequency": 15}
+            return dict(PACING_BY_PACE["medium"])
 
     def _determine_support_level(self, profile: Dict) -> str:
         """Determine level of support needed"""
@@ -353,21 +687,4 @@ class StudentProfiler:
         learning_trends = profile.get("learning_trends", {})
         recent_trend = learning_trends.get("recent_trend", "stable")
 
-        if recent_trend == "declining":
-            return {
-                "strategy": "encouragement",
-                "focus": "small_wins",
-                "rewards": "frequent"
-            }
-        elif recent_trend == "improving":
-            return {
-                "strategy": "challenge",
-                "focus": "growth",
-                "rewards": "achievement_based"
-            }
-        else:
-            return {
-                "strategy": "balanced",
-                "focus": "consistency",
-                "rewards": "progress_based"
-            }
\ No newline at end of file
+        return dict(MOTIVATION_BY_TREND.get(recent_trend, MOTIVATION_BY_TREND["stable"]))
\ No newline at end of file
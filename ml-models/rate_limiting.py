@@ -0,0 +1,74 @@
+"""
+Rate Limiting - Shared OpenAI throttling for the AI components
+Keeps concurrent calls under the account's request and token per-minute limits
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from openai import APIConnectionError, APITimeoutError, RateLimitError
+
+T = TypeVar("T")
+
+class RateLimiter:
+    """
+    Bounds in-flight OpenAI calls with a semaphore and paces them with token buckets
+    for requests/minute and tokens/minute, retrying rate-limited or timed-out calls
+    with exponential backoff
+    """
+
+    def __init__(self,
+                 max_concurrent: int = 8,
+                 requests_per_minute: int = 500,
+                 tokens_per_minute: int = 90_000,
+                 max_attempts: int = 3):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_attempts = max_attempts
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._request_capacity = float(requests_per_minute)
+        self._token_capacity = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+
+    def _refill(self):
+        """Top both buckets up for the time elapsed since the last refill"""
+        now = time.monotonic()
+        elapsed_minutes = (now - self._last_refill) / 60
+        self._last_refill = now
+        self._request_capacity = min(
+            self.requests_per_minute,
+            self._request_capacity + self.requests_per_minute * elapsed_minutes
+        )
+        self._token_capacity = min(
+            self.tokens_per_minute,
+            self._token_capacity + self.tokens_per_minute * elapsed_minutes
+        )
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens fit under the per-minute limits"""
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            self._refill()
+            if self._request_capacity >= 1 and self._token_capacity >= tokens:
+                self._request_capacity -= 1
+                self._token_capacity -= tokens
+                return
+            # Sleep roughly until whichever bucket is short has refilled enough
+            wait_minutes = max(
+                (1 - self._request_capacity) / self.requests_per_minute,
+                (tokens - self._token_capacity) / self.tokens_per_minute
+            )
+            await asyncio.sleep(max(wait_minutes * 60, 0.01))
+
+    async def call(self, make_request: Callable[[], Awaitable[T]], tokens: int) -> T:
+        """Run an API call under the concurrency cap and rate limits, retrying 429s and timeouts"""
+        async with self._semaphore:
+            for attempt in range(self.max_attempts):
+                await self.acquire(tokens)
+                try:
+                    return await make_request()
+                except (RateLimitError, APITimeoutError, APIConnectionError):
+                    if attempt == self.max_attempts - 1:
+                        raise
+                    await asyncio.sleep(2 ** attempt)
@@ -0,0 +1,122 @@
+"""
+Semantic Cache - Reuses completions for repeated or near-duplicate prompts
+Exact hits are matched on a prompt hash, fuzzy hits by cosine similarity of prompt embeddings
+within the same scope
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from openai import AsyncOpenAI, OpenAIError
+
+from openai_client import without_retries
+from rate_limiting import RateLimiter
+
+class SemanticCache:
+    """
+    In-process cache in front of chat completions. A prompt is looked up by its sha256 first,
+    then by the nearest stored embedding; anything at or above `threshold` cosine similarity
+    counts as a hit. Oldest entries are dropped once `max_entries` is reached.
+
+    Callers pass the short, variable part of a request as `prompt` (e.g. the question text,
+    not the template around it, which would make unrelated prompts look alike) and anything
+    that must match exactly, such as a subject or a question slot, as `scope`: a fuzzy hit
+    never crosses scopes. Embedding calls go through `rate_limiter` when one is given, so they
+    count against the same per-minute limits as the completions they stand in for
+    """
+
+    def __init__(self,
+                 client: AsyncOpenAI,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 threshold: float = 0.95,
+                 max_entries: int = 10_000,
+                 embedding_model: str = "text-embedding-3-small"):
+        self.client = client
+        self.rate_limiter = rate_limiter
+        # Limited calls are retried by the limiter alone
+        self._limited_client = without_retries(client) if rate_limiter is not None else client
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.embedding_model = embedding_model
+        self._exact: Dict[str, str] = OrderedDict()
+        self._keys: List[str] = []
+        self._scopes: List[str] = []
+        self._vectors: List[np.ndarray] = []
+        self._responses: List[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._scope_array: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _hash(prompt: str, scope: str) -> str:
+        return hashlib.sha256(f"{scope}\0{prompt}".encode()).hexdigest()
+
+    async def embed(self, prompt: str) -> Optional[np.ndarray]:
+        """
+        Unit-length embedding of the prompt, or None if the embeddings call fails. Callers that
+        look up several scopes for the same prompt embed it once and pass the vector to lookup()
+        """
+        create = lambda: self._limited_client.embeddings.create(model=self.embedding_model, input=prompt)
+        try:
+            if self.rate_limiter is None:
+                response = await create()
+            else:
+                response = await self.rate_limiter.call(create, tokens=len(prompt) // 4 + 1)
+        except OpenAIError:
+            return None
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def _nearest(self, vector: np.ndarray, scope: str) -> Optional[str]:
+        if not self._vectors:
+            return None
+        if self._matrix is None:
+            self._matrix = np.vstack(self._vectors)
+            self._scope_array = np.array(self._scopes, dtype=object)
+        similarities = np.where(self._scope_array == scope, self._matrix @ vector, -np.inf)
+        best = int(similarities.argmax())
+        return self._responses[best] if similarities[best] >= self.threshold else None
+
+    async def lookup(self,
+                     prompt: str,
+                     scope: str = "",
+                     vector: Optional[np.ndarray] = None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        The cached completion for `prompt` in `scope` (or None), plus its embedding to pass to
+        store(). `vector` is the prompt's embedding from embed(), if the caller already has it
+        """
+        key = self._hash(prompt, scope)
+        if key in self._exact:
+            return self._exact[key], vector
+
+        if vector is None:
+            vector = await self.embed(prompt)
+        return (self._nearest(vector, scope) if vector is not None else None), vector
+
+    def store(self, prompt: str, vector: Optional[np.ndarray], response: str, scope: str = ""):
+        """Cache `response` for `prompt` in `scope`, indexing it under the embedding lookup() returned"""
+        key = self._hash(prompt, scope)
+        if len(self._exact) >= self.max_entries:
+            self._exact.popitem(last=False)
+            # Vectors are appended in the same order, so evicted entries are always at the front
+            while self._keys and self._keys[0] not in self._exact:
+                del self._keys[0], self._scopes[0], self._vectors[0], self._responses[0]
+                self._matrix = None
+        self._exact[key] = response
+        if vector is not None:
+            self._keys.append(key)
+            self._scopes.append(scope)
+            self._vectors.append(vector)
+            self._responses.append(response)
+            self._matrix = None
+
+    async def cached_chat(self, prompt: str, complete: Callable[[], Awaitable[str]], scope: str = "") -> str:
+        """Return a cached completion for `prompt` in `scope`, or call `complete()` and cache its result"""
+        cached, vector = await self.lookup(prompt, scope)
+        if cached is not None:
+            return cached
+
+        response = await complete()
+        self.store(prompt, vector, response, scope)
+        return response
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The components import each other as top-level modules (e.g. `from semantic_cache import ...`),
+# as they do when ml-models and the component directories are on the path in deployment
+ML_MODELS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ML_MODELS, *(os.path.join(ML_MODELS, name) for name in ("personalization", "content_generation", "doubt_clearing"))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
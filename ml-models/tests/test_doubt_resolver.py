@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from doubt_resolver import DoubtResolver
+
+class FakeCache:
+    def __init__(self):
+        self.stored = []
+
+    async def lookup(self, prompt, scope=""):
+        return None, None
+
+    def store(self, prompt, vector, response, scope=""):
+        self.stored.append(response)
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+async def stream(*items):
+    for item in items:
+        if isinstance(item, Exception):
+            raise item
+        yield chunk(item)
+
+def make_resolver(*items):
+    """A resolver whose completion streams `items`, raising any that are exceptions"""
+    async def call(make_request, tokens):
+        return stream(*items)
+
+    # Only the collaborators _generate_response uses; the full constructor loads NLTK data
+    resolver = DoubtResolver.__new__(DoubtResolver)
+    resolver.response_cache = FakeCache()
+    resolver.rate_limiter = SimpleNamespace(call=call)
+    resolver._limited_client = None
+    resolver._create_response_prompt = lambda *args: "prompt"
+    return resolver
+
+async def collect(resolver):
+    return [text async for text in resolver._generate_response("why?", None, "Math", {}, {}, {})]
+
+@pytest.mark.asyncio
+async def test_complete_stream_is_cached():
+    resolver = make_resolver("Fractions ", "are parts.")
+    assert await collect(resolver) == ["Fractions ", "are parts."]
+    assert resolver.response_cache.stored == ["Fractions are parts."]
+
+@pytest.mark.asyncio
+async def test_failure_before_any_text_falls_back():
+    resolver = make_resolver(RuntimeError("connection reset"))
+    [fallback] = await collect(resolver)
+    assert fallback.startswith("That's a thoughtful question!")
+    assert resolver.response_cache.stored == []
+
+@pytest.mark.asyncio
+async def test_failure_mid_stream_propagates_and_is_not_cached():
+    resolver = make_resolver("Fractions ", RuntimeError("connection reset"))
+    received = []
+    with pytest.raises(RuntimeError):
+        async for text in resolver._generate_response("why?", None, "Math", {}, {}, {}):
+            received.append(text)
+    assert received == ["Fractions "]
+    assert resolver.response_cache.stored == []
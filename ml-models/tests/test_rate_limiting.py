@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import rate_limiting
+from rate_limiting import RateLimiter
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+def rate_limited():
+    return openai.RateLimitError("Rate limit reached", response=httpx.Response(429, request=REQUEST), body=None)
+
+class FlakyRequest:
+    """Raises each of `errors` on successive calls, then returns "ok" """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """The limiter's sleeps, recorded and skipped on a fake clock"""
+    delays = []
+    clock = [0.0]
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        delays.append(delay)
+        clock[0] += delay
+        await real_sleep(0)
+
+    monkeypatch.setattr(rate_limiting.asyncio, "sleep", sleep)
+    monkeypatch.setattr(rate_limiting.time, "monotonic", lambda: clock[0])
+    return delays
+
+@pytest.mark.asyncio
+async def test_retries_rate_limits_and_timeouts_with_backoff(backoffs):
+    request = FlakyRequest(rate_limited(), openai.APITimeoutError(request=REQUEST))
+    assert await RateLimiter().call(request, tokens=10) == "ok"
+    assert request.calls == 3
+    assert backoffs == [1, 2]
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_attempts(backoffs):
+    request = FlakyRequest(*(rate_limited() for _ in range(3)))
+    with pytest.raises(openai.RateLimitError):
+        await RateLimiter(max_attempts=3).call(request, tokens=10)
+    assert request.calls == 3
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried(backoffs):
+    request = FlakyRequest(ValueError("bad request"))
+    with pytest.raises(ValueError):
+        await RateLimiter().call(request, tokens=10)
+    assert request.calls == 1
+    assert backoffs == []
+
+@pytest.mark.asyncio
+async def test_waits_for_the_token_bucket_to_refill(backoffs):
+    limiter = RateLimiter(tokens_per_minute=100)
+    await limiter.call(FlakyRequest(), tokens=100)
+    await limiter.call(FlakyRequest(), tokens=50)
+    # The second call found the bucket empty and slept for half a minute's refill
+    assert backoffs == [pytest.approx(30)]
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import numpy as np
+import openai
+import pytest
+
+from semantic_cache import SemanticCache
+
+class FakeEmbeddings:
+    """Embeds each known prompt as a fixed vector and counts the calls"""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    async def create(self, model, input):
+        self.calls += 1
+        if input not in self.vectors:
+            raise openai.APIConnectionError(request=None)
+        return SimpleNamespace(data=[SimpleNamespace(embedding=self.vectors[input])])
+
+def make_cache(**kwargs):
+    embeddings = FakeEmbeddings({
+        "what is a fraction": [1.0, 0.0],
+        "what's a fraction": [0.99, 0.05],
+        "who wrote hamlet": [0.0, 1.0],
+    })
+    client = SimpleNamespace(embeddings=embeddings, with_options=lambda **options: client)
+    return SemanticCache(client, **kwargs), embeddings
+
+@pytest.mark.asyncio
+async def test_near_duplicate_prompt_hits_within_its_scope_only():
+    cache, _ = make_cache()
+    cached, vector = await cache.lookup("what is a fraction", "math")
+    assert cached is None
+    cache.store("what is a fraction", vector, "a part of a whole", "math")
+
+    assert (await cache.lookup("what's a fraction", "math"))[0] == "a part of a whole"
+    assert (await cache.lookup("what's a fraction", "english"))[0] is None
+    assert (await cache.lookup("who wrote hamlet", "math"))[0] is None
+
+@pytest.mark.asyncio
+async def test_given_vector_is_not_embedded_again():
+    cache, embeddings = make_cache()
+    vector = await cache.embed("what is a fraction")
+    cache.store("what is a fraction", vector, "a part of a whole", "slot-0")
+    await cache.lookup("what's a fraction", "slot-1", vector)
+    await cache.lookup("what's a fraction", "slot-0", vector)
+    assert embeddings.calls == 1
+
+@pytest.mark.asyncio
+async def test_failed_embedding_still_allows_exact_hits():
+    cache, _ = make_cache()
+    cached, vector = await cache.lookup("unknown prompt")
+    assert (cached, vector) == (None, None)
+    cache.store("unknown prompt", vector, "answer")
+    assert (await cache.lookup("unknown prompt"))[0] == "answer"
+
+@pytest.mark.asyncio
+async def test_oldest_entries_are_evicted():
+    cache, _ = make_cache(max_entries=1)
+    for prompt, answer in (("what is a fraction", "fraction"), ("who wrote hamlet", "Shakespeare")):
+        _, vector = await cache.lookup(prompt)
+        cache.store(prompt, vector, answer)
+
+    assert (await cache.lookup("what's a fraction"))[0] is None
+    assert (await cache.lookup("who wrote hamlet"))[0] == "Shakespeare"
+    assert len(cache._vectors) == 1
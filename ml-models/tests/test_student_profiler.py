@@ -0,0 +1,105 @@
+import math
+import random
+import warnings
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+
+import student_profiler
+from student_profiler import StudentProfiler, _parse_date, _score_stats, _small_score_stats
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-05", "2024-01-05T00:00"),
+    ("2024-1-5", "2024-01-05T00:00"),
+    ("15/01/2024", "2024-01-15T00:00"),
+    ("2024-01-05 10:00", "2024-01-05T10:00"),
+    ("2024-01-05T10:00:00+05:30", "2024-01-05T04:30"),
+    ("2024-01-05T10:00:00Z", "2024-01-05T10:00"),
+    (date(2024, 1, 5), "2024-01-05T00:00"),
+    (datetime(2024, 1, 5, 3), "2024-01-05T03:00"),
+])
+def test_parse_date_accepts_what_pandas_did(value, expected):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert _parse_date(value) == np.datetime64(expected, "ns")
+
+def test_parse_date_rejects_garbage_with_clear_error():
+    with pytest.raises(ValueError, match="Unrecognized assessment_date"):
+        _parse_date("not a date")
+
+def test_records_are_ordered_by_parsed_date_across_formats():
+    records = [
+        {"subject": "Math", "score": 90, "assessment_date": "15/01/2024"},
+        {"subject": "Math", "score": 50, "assessment_date": "2024-1-5"},
+    ]
+    trends = StudentProfiler().analyze_academic_history(records)["learning_trends"]
+    # Ordered by date the scores rise, whatever order or format they came in
+    assert trends["overall_trend"] == "improving"
+
+def _records(n, seed=0):
+    rng = random.Random(seed)
+    return [{
+        "subject": rng.choice(["Math", "Science", "English", "History"]),
+        "topic": rng.choice(["algebra", "optics", "grammar"]),
+        "score": rng.randint(20, 100),
+        "difficulty_level": rng.choice(["easy", "medium", "hard"]),
+        "time_taken_minutes": rng.randint(5, 60),
+        "assessment_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    } for _ in range(n)]
+
+def _reference_stats(scores):
+    slope = lambda ys: np.polyfit(np.arange(len(ys)), ys, 1)[0] if len(ys) > 1 else 0.0
+    return (scores.mean(), scores.std(ddof=1) if scores.size > 1 else math.nan, scores.min(),
+            scores.max(), slope(scores), slope(scores[-10:]), scores[:5].mean(), scores[-5:].mean())
+
+def _assert_close(actual, expected):
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            _assert_close(actual[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            _assert_close(a, e)
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected, rel=1e-9, abs=1e-9, nan_ok=True)
+    else:
+        assert actual == expected
+
+@pytest.mark.parametrize("n", [1, 2, 5, 10, 31, 32, 100])
+def test_score_stats_match_numpy_reference(n):
+    scores = np.random.default_rng(n).uniform(0, 100, n)
+    expected = _reference_stats(scores)
+    assert _score_stats(scores) == pytest.approx(expected, nan_ok=True)
+    assert _small_score_stats(scores.tolist()) == pytest.approx(expected, nan_ok=True)
+
+def test_compiled_kernel_matches_python():
+    pytest.importorskip("numba")
+    scores = np.random.default_rng(1).uniform(0, 100, 200)
+    assert _score_stats(scores) == pytest.approx(_score_stats.py_func(scores))
+
+@pytest.mark.parametrize("n", [3, 20])
+def test_profile_is_the_same_on_both_statistics_paths(n, monkeypatch):
+    records = _records(n, seed=n)
+    small = StudentProfiler().analyze_academic_history(records).to_dict()
+    monkeypatch.setattr(student_profiler, "_SMALL_HISTORY", 0)
+    _assert_close(StudentProfiler().analyze_academic_history(records).to_dict(), small)
+
+def test_subject_means_match_grouped_scores():
+    records = _records(200)
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record["subject"], []).append(record["score"])
+
+    subject_scores = StudentProfiler().analyze_academic_history(records)["subject_strengths"]["subject_scores"]
+    means = dict(zip(subject_scores["subjects"], subject_scores["means"]))
+    assert means == pytest.approx({subject: sum(s) / len(s) for subject, s in grouped.items()})
+
+def test_cached_profile_is_not_changed_by_callers():
+    profiler = StudentProfiler()
+    records = _records(10)
+    profiler.analyze_academic_history(records)["overall_performance"]["average_score"] = -1
+    repeat = profiler.analyze_academic_history(records)
+    assert repeat["overall_performance"]["average_score"] == pytest.approx(
+        sum(record["score"] for record in records) / len(records))